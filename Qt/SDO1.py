@@ -1,5 +1,12 @@
 import serial
 
+# Command bytes and replies, from src/parameters.h and send_ack/send_nack in src/main.c
+CONVERSION_START = 0x31
+CONVERSION_STOP = 0x32
+TRIGGER_LEVEL = 0x33
+BAUD_RATE = 0x34
+RECV_ACK = 0xFF
+NACK = 0x00
 
 def SDO_Connect(port, baud_rate, byte_size, parity, stopbit) -> serial.Serial:
     conn = serial.Serial(port, baud_rate, byte_size, parity, stopbit)
@@ -22,22 +29,29 @@ def SDO_Read(connection: serial.Serial):
         return buffer.hex()
 
 def SDO_Start_Conversion(connection: serial.Serial):
-    command = 0x31
+    command = CONVERSION_START
     SDO_WriteCommand(connection, command)
     buffer = SDO_Read(connection)
     return buffer
     
 def SDO_Stop_Conversion(connection: serial.Serial):
-    command = 0x32
+    command = CONVERSION_STOP
     SDO_WriteCommand(connection, command)
     buffer = SDO_Read(connection)
     return buffer
 
+def SDO_Set_Trigger_Level(connection: serial.Serial, level: int):
+    SDO_WriteCommand(connection, TRIGGER_LEVEL)
+    buffer = SDO_Read(connection)
+    SDO_WriteCommand(connection, level & 0xFF)
+    return buffer
+
 
-conn = SDO_Connect("COM3", 9600, serial.EIGHTBITS, serial.PARITY_NONE, serial.STOPBITS_ONE)
-# print(SDO_WriteCommand(conn, 0x31))
-# print(SDO_Read(conn))
-print(SDO_Start_Conversion(conn))
-print(SDO_Stop_Conversion(conn))
+if __name__ == '__main__':
+    conn = SDO_Connect("COM3", 9600, serial.EIGHTBITS, serial.PARITY_NONE, serial.STOPBITS_ONE)
+    # print(SDO_WriteCommand(conn, 0x31))
+    # print(SDO_Read(conn))
+    print(SDO_Start_Conversion(conn))
+    print(SDO_Stop_Conversion(conn))
 
-# print(SDO_Read(conn))
\ No newline at end of file
+    # print(SDO_Read(conn))
\ No newline at end of file
@@ -0,0 +1,174 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from measure import measure_waveform
+from spectrum import power_spectrum, spectrum_window
+
+log = logging.getLogger('sdo.analysis')
+
+
+def analysis_measure(samples, sample_rate, channels):
+    """WaveformMeasurements of every row, keyed by the channel it came from."""
+    return {channel: measure_waveform(row, sample_rate) for channel, row in zip(channels, samples)}
+
+
+def analysis_spectrum(samples, size, window):
+    """Power spectrum of the first row, to be averaged by a SpectrumEngine."""
+    return power_spectrum(samples[0], spectrum_window(window, size))
+
+
+# Jobs a worker can run: task(samples, **kwargs) with samples a (k, n) array
+TASKS = {
+    'measure': analysis_measure,
+    'spectrum': analysis_spectrum,
+}
+
+# Segments this worker process has attached to, by name
+_attached = {}
+
+
+def _run(name, slot, shape, task, kwargs):
+    shm = _attached.get(name)
+    if shm is None:
+        # Workers share the parent's resource tracker, so attaching does
+        # not make this process responsible for unlinking the segment
+        shm = _attached[name] = SharedMemory(name=name)
+    slots = np.ndarray(kwargs.pop('_layout'), dtype=np.float32, buffer=shm.buf)
+    return TASKS[task](slots[slot, :shape[0], :shape[1]], **kwargs)
+
+
+class AnalysisExecutor(QObject):
+    """Runs analysis jobs in a pool of worker processes.
+
+    Samples travel through one shared memory segment divided into slots of
+    (channels, slot_samples) float32, so only the job description is
+    pickled. Each job has a kind ('measure', 'spectrum'); submitting a job
+    supersedes the previous one of the same kind, which is cancelled if it
+    has not started and has its result discarded if it has. Results of
+    current jobs arrive on the GUI thread through result_ready(kind,
+    result, context), context being whatever was passed to submit().
+    slot_samples must cover the longest window that will be submitted.
+    The whole segment is committed up front on Windows (Linux only backs
+    the pages that get written), so size it for the windows actually in
+    use rather than the largest possible one. Two jobs of each kind, one
+    running and one queued, need four slots.
+    """
+    result_ready = pyqtSignal(str, object, object)
+
+    def __init__(self, workers=None, slots=4, channels=4, slot_samples=65536, parent=None):
+        super().__init__(parent)
+        self.layout = (slots, channels, slot_samples)
+        self.shm = SharedMemory(create=True, size=int(np.prod(self.layout)) * 4)
+        self.slots = np.ndarray(self.layout, dtype=np.float32, buffer=self.shm.buf)
+        self.free = list(range(slots))
+        self.lock = threading.Lock()
+        # Spawned workers do not inherit the Qt state of this process
+        self.pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        self.closing = False
+        # Set once a worker has died; the pool then refuses every job
+        self.broken = False
+        self.jobs = {}
+        self.generations = {}
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.stale = 0
+        self.dropped = 0
+
+    def submit(self, kind, samples, context=None, **kwargs):
+        """Queues task kind on the newest samples of each row of samples (a
+        1-D array, a (k, n) array or a list of 1-D arrays, which are copied
+        straight into the slot); returns False when every slot is busy or
+        the pool is broken."""
+        if self.broken:
+            return False
+        if isinstance(samples, np.ndarray) and samples.ndim == 1:
+            samples = [samples]
+        _, channels, slot_samples = self.layout
+        rows = min(len(samples), channels)
+        n = min(len(row) for row in samples[:rows])
+        if n > slot_samples:
+            raise ValueError(f"{n} samples do not fit in a slot of {slot_samples}")
+        previous = self.jobs.get(kind)
+        if previous is not None and previous.cancel():
+            self.cancelled += 1
+        with self.lock:
+            if not self.free:
+                self.dropped += 1
+                return False
+            slot = self.free.pop()
+        for i in range(rows):
+            self.slots[slot, i, :n] = samples[i][len(samples[i]) - n:]
+        generation = self.generations.get(kind, 0) + 1
+        self.generations[kind] = generation
+        try:
+            future = self.pool.submit(_run, self.shm.name, slot, (rows, n), kind, dict(kwargs, _layout=self.layout))
+        except (BrokenProcessPool, RuntimeError) as e:
+            with self.lock:
+                self.free.append(slot)
+            self._broke(e)
+            return False
+        self.jobs[kind] = future
+        self.submitted += 1
+        future.add_done_callback(lambda f: self._finished(kind, generation, slot, context, f))
+        return True
+
+    def _finished(self, kind, generation, slot, context, future):
+        with self.lock:
+            self.free.append(slot)
+            drained = self.closing and len(self.free) == self.layout[0]
+        if drained:
+            self._release()
+        if future.cancelled() or self.closing:
+            return
+        if generation != self.generations.get(kind):
+            # Newer data was submitted while this job ran
+            self.stale += 1
+            return
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._broke(error)
+            return
+        if error is not None:
+            log.error("Analysis job %s failed: %s", kind, error)
+            return
+        self.completed += 1
+        self.result_ready.emit(kind, future.result(), context)
+
+    def _broke(self, error):
+        if not self.broken:
+            self.broken = True
+            log.error("Analysis workers failed, no more jobs will be accepted: %s", error)
+
+    def stats(self):
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'cancelled': self.cancelled,
+            'stale': self.stale,
+            'dropped': self.dropped,
+        }
+
+    def shutdown(self):
+        """Cancels queued jobs and returns without waiting for running ones;
+        the shared memory is unlinked once the last of them has finished."""
+        with self.lock:
+            self.closing = True
+            drained = len(self.free) == self.layout[0]
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        if drained:
+            self._release()
+
+    def _release(self):
+        if self.slots is None:
+            return
+        self.slots = None
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,277 @@
+"""Headless benchmarks of the acquisition-to-display pipeline.
+
+Runs on the offscreen Qt platform and writes one JSON document with the
+results of every benchmark, so runs on different commits can be compared:
+
+    python benchmark.py --output before.json
+    python benchmark.py --compare before.json
+"""
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PyQt6.QtWidgets import QApplication
+
+import main
+from emulator import FirmwareEmulator
+from frame import FrameDecoder, FRAME_SIZE, FRAME_CAPACITY
+from simulator import SignalGenerator, SignalSpec, SimulatorReader
+
+
+def percentiles(values):
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return None
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'mean': float(values.mean()), 'p50': float(p50), 'p90': float(p90), 'p99': float(p99),
+            'max': float(values.max())}
+
+
+class Measurement:
+    """Wall time, GC collections and peak RSS over a with-block."""
+
+    def __enter__(self):
+        gc.collect()
+        self.gc_before = [s['collections'] for s in gc.get_stats()]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self.gc_collections = [s['collections'] - b for s, b in zip(gc.get_stats(), self.gc_before)]
+
+    def result(self, **values):
+        return dict(values, elapsed_s=self.elapsed, gc_collections=self.gc_collections, peak_rss_mb=peak_rss_mb())
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, or None where the resource
+    module is not available (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextlib.contextmanager
+def quiet():
+    # The application logs to stderr, next to the --compare table; keep
+    # everything but errors out of it while a benchmark runs
+    logger = logging.getLogger('sdo')
+    level = logger.level
+    logger.setLevel(logging.ERROR)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+def bench_decode(frames=20000):
+    """FrameDecoder.feed over a stream of valid frames, in serial-sized chunks."""
+    raw = SignalGenerator([SignalSpec(offset=1.65, noise=0.01)], seed=0).frames(frames)
+    chunk = 4096
+    decoder = FrameDecoder()
+    decoded = 0
+    with Measurement() as m:
+        for i in range(0, len(raw), chunk):
+            for _ in decoder.feed(raw[i:i + chunk]):
+                decoded += 1
+    return m.result(frames=decoded, decode_mb_s=len(raw) / m.elapsed / 1e6,
+                    samples_s=decoded * FRAME_CAPACITY / m.elapsed)
+
+
+def wait(app, seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        app.processEvents()
+
+
+def start_app(app, reader, fps, offload=False):
+    """OscilloscopeApp with its plot window open, fed by reader, with the
+    per-block latency and the render time of every frame recorded."""
+    window = main.OscilloscopeApp()
+    window.render_scheduler.set_fps(fps)
+    window.offload_check.setChecked(offload)
+    window.run_plot()
+    stats = {'received': [], 'latency': [], 'render': []}
+
+    plot_update = window.plot_window.update_plot
+
+    def timed_update(*args, **kwargs):
+        start = time.perf_counter()
+        plot_update(*args, **kwargs)
+        stats['render'].append(time.perf_counter() - start)
+    window.plot_window.update_plot = timed_update
+
+    def received(block, sequence, timestamp):
+        now = time.monotonic()
+        stats['received'].append((sequence, now, block.shape[1]))
+        stats['latency'].append(now - timestamp)
+
+    window.serial_thread = reader
+    # Connected first, so the time is taken before process_data runs
+    reader.data_received.connect(received)
+    reader.data_received.connect(window.process_data)
+    window.is_running = True
+    window.render_scheduler.start()
+    return window, stats
+
+
+def stop_app(window):
+    window.stop_acquisition()
+    window.plot_window.close()
+    window.close()
+
+
+def pipeline_result(m, stats, seconds, **extra):
+    samples = sum(n for _, _, n in stats['received'])
+    return m.result(blocks=len(stats['received']), samples_s=samples / seconds,
+                    queue_latency_ms=percentiles(np.array(stats['latency']) * 1e3),
+                    render_ms=percentiles(np.array(stats['render']) * 1e3),
+                    frames_rendered=len(stats['render']), **extra)
+
+
+def bench_serial(app, seconds=3.0, fps=30, offload=False):
+    """SerialReader reading Frame_t packets from the firmware emulator as
+    fast as it can drain the pty, through process_data and rendering.
+    Latency runs from the frame leaving the emulator to process_data."""
+    emulator = FirmwareEmulator(frame_rate=0, autostart=True, history=None)
+    emulator.open()
+    with quiet():
+        reader = main.SerialReader(emulator.port, 921600)
+        window, stats = start_app(app, reader, fps, offload)
+        with Measurement() as m:
+            reader.start()
+            wait(app, seconds)
+            reader.running = False
+            sent = list(emulator.sent_times)
+            frames_sent = emulator.frames_sent
+        stop_app(window)
+    emulator.close()
+
+    # Block sequence k is frame k, as long as none was lost
+    first = frames_sent - len(sent)
+    wire = [now - sent[sequence - first] for sequence, now, _ in stats['received']
+            if first <= sequence < frames_sent]
+    mb = frames_sent * FRAME_SIZE / 1e6
+    return pipeline_result(m, stats, seconds, frames_sent=frames_sent, serial_mb_s=mb / seconds,
+                           corrupt_ratio=reader.decoder.corrupt_ratio,
+                           frame_latency_ms=percentiles(np.array(wire) * 1e3))
+
+
+def bench_simulator(app, seconds=3.0, fps=30, offload=False, channels=4, block_size=4096):
+    """Unthrottled multi-channel volts from SimulatorReader through
+    process_data and rendering, without the serial link."""
+    specs = [SignalSpec('sine', frequency=1000 * (k + 1), offset=1.65, noise=0.01) for k in range(channels)]
+    reader = SimulatorReader(SignalGenerator(specs, sample_rate=1e6, seed=0), block_size=block_size, speed=0)
+    with quiet():
+        window, stats = start_app(app, reader, fps, offload)
+        window.set_sample_rate(reader.sample_rate)
+        with Measurement() as m:
+            reader.start()
+            wait(app, seconds)
+            reader.running = False
+        stop_app(window)
+    return pipeline_result(m, stats, seconds)
+
+
+def bench_render(app, frames=200):
+    """OscilloscopeApp.update_plot on a full buffer, back to back."""
+    specs = [SignalSpec('sine', frequency=1000 * (k + 1), offset=1.65, noise=0.01) for k in range(4)]
+    with quiet():
+        window = main.OscilloscopeApp()
+        window.run_plot()
+        window.set_sample_rate(1e6)
+        generator = SignalGenerator(specs, sample_rate=window.sample_rate, seed=0)
+        while len(window.data_buffer) < window.data_buffer.capacity:
+            window.data_buffer.write(generator.generate(65536))
+        # The first frame builds the pyramid and pays for lazy initialisation
+        window.update_plot()
+        app.processEvents()
+        times = []
+        with Measurement() as m:
+            for _ in range(frames):
+                start = time.perf_counter()
+                window.update_plot()
+                times.append(time.perf_counter() - start)
+                app.processEvents()
+        window.plot_window.close()
+        window.close()
+    return m.result(frames=frames, render_ms=percentiles(np.array(times) * 1e3), fps=frames / m.elapsed)
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(baseline, results):
+    """Prints every numeric result next to the baseline's and the ratio."""
+    old = flatten(baseline['benchmarks'])
+    new = flatten(results['benchmarks'])
+    for key in sorted(new):
+        if key in old and old[key]:
+            print(f"{key:50s} {old[key]:14.4f} {new[key]:14.4f} {new[key] / old[key]:8.2f}x", file=sys.stderr)
+
+
+BENCHMARKS = {
+    'decode': lambda app, args: bench_decode(),
+    'serial': lambda app, args: bench_serial(app, args.seconds, args.fps, args.offload),
+    'simulator': lambda app, args: bench_simulator(app, args.seconds, args.fps, args.offload),
+    'render': lambda app, args: bench_render(app),
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benchmarks', nargs='*', help=f"benchmarks to run, out of {', '.join(BENCHMARKS)} (default all)")
+    parser.add_argument('--seconds', type=float, default=3.0, help="duration of the streaming benchmarks")
+    parser.add_argument('--fps', type=int, default=30, help="render rate of the streaming benchmarks")
+    parser.add_argument('--offload', action='store_true', help="run the analysis in worker processes")
+    parser.add_argument('--output', help="write the JSON results to this file instead of stdout")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    app = QApplication(sys.argv)
+    results = {'environment': dict(environment(), offload=args.offload), 'benchmarks': {}}
+    for name in args.benchmarks or BENCHMARKS:
+        results['benchmarks'][name] = BENCHMARKS[name](app, args)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
@@ -0,0 +1,72 @@
+import threading
+
+import numpy as np
+
+
+class BlockPool:
+    """Recycles fixed-shape sample blocks between the reader thread and
+    their consumer.
+
+    acquire() hands out a preallocated block (or allocates a new one when
+    the pool has run dry) and release() puts it back once the consumer has
+    copied the samples out. Views of a pooled block can be released
+    directly; anything that did not come from the pool is ignored.
+    """
+
+    def __init__(self, shape, dtype=np.float32, size=64):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.size = size
+        self.free = [np.empty(self.shape, dtype=self.dtype) for _ in range(size)]
+        self.lock = threading.Lock()
+        self.misses = 0
+
+    def acquire(self):
+        with self.lock:
+            if self.free:
+                return self.free.pop()
+            self.misses += 1
+        return np.empty(self.shape, dtype=self.dtype)
+
+    def release(self, block):
+        owner = block if block.base is None else block.base
+        if not isinstance(owner, np.ndarray) or owner.shape != self.shape or owner.dtype != self.dtype:
+            return
+        with self.lock:
+            if len(self.free) < self.size and not any(b is owner for b in self.free):
+                self.free.append(owner)
+
+    def available(self):
+        with self.lock:
+            return len(self.free)
+
+
+class InFlightLimit:
+    """Caps the blocks a reader has emitted that its consumer has not
+    released yet.
+
+    A source that produces faster than real time calls wait() before
+    making each block and sent() after emitting it; the consumer's
+    release() lets the next one through. Without it an unpaced reader
+    fills the Qt event queue faster than the GUI thread drains it.
+    """
+
+    def __init__(self, limit=32):
+        self.limit = limit
+        self.pending = 0
+        self.condition = threading.Condition()
+
+    def wait(self, timeout=None):
+        """True once fewer than limit blocks are in flight, False on timeout."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.pending < self.limit, timeout)
+
+    def sent(self):
+        with self.condition:
+            self.pending += 1
+
+    def release(self):
+        with self.condition:
+            if self.pending:
+                self.pending -= 1
+                self.condition.notify()
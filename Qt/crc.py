@@ -0,0 +1,89 @@
+import numpy as np
+
+# STM32F1 CRC unit: CRC-32/MPEG-2 (poly 0x04C11DB7, init 0xFFFFFFFF, no
+# reflection, no final xor), fed one 32-bit word per write to CRC->DR.
+# calc_checksum in src/frame.c writes each uint16 sample to DR, so every
+# sample enters the CRC as a zero-extended 32-bit word.
+CRC_POLY = 0x04C11DB7
+CRC_INIT = 0xFFFFFFFF
+
+
+def _byte_table():
+    crc = np.arange(256, dtype=np.uint32) << 24
+    for _ in range(8):
+        crc = np.where(crc & 0x80000000, (crc << 1) ^ CRC_POLY, crc << 1).astype(np.uint32)
+    return crc
+
+
+BYTE_TABLE = _byte_table()
+
+
+def _advance_word(crc):
+    # Clock 32 zero bits through the register
+    for _ in range(4):
+        crc = (crc << 8) ^ BYTE_TABLE[crc >> 24]
+    return crc
+
+
+# The CRC is linear, so the register after L words is
+#   A^L(init) ^ A^(L-j)(w_0) ^ ... ^ A^1(w_(L-1))
+# where A advances the register by one word. _position_table[d - 1, k, b]
+# holds A^d(b << 8k) for the two low bytes of a word, and _init_table[L]
+# holds A^L(CRC_INIT); a CRC is then one gather and one xor-reduce.
+_position_table = np.empty((0, 2, 256), dtype=np.uint32)
+_init_table = np.array([CRC_INIT], dtype=np.uint32)
+
+# Reversed word positions, sliced by stm32_crc32 instead of rebuilt per call
+_distances = np.arange(4095, -1, -1)
+
+
+def _ensure_tables(words):
+    global _position_table, _init_table
+    have = len(_position_table)
+    if have >= words:
+        return
+    table = np.empty((words, 2, 256), dtype=np.uint32)
+    init = np.empty(words + 1, dtype=np.uint32)
+    table[:have] = _position_table
+    init[:have + 1] = _init_table
+    if have == 0:
+        base = np.arange(256, dtype=np.uint32)
+        prev = np.stack([base, base << 8])
+    else:
+        prev = table[have - 1]
+    for d in range(have, words):
+        prev = table[d] = _advance_word(prev)
+        init[d + 1] = _advance_word(init[d:d + 1])[0]
+    _position_table = table
+    _init_table = init
+
+
+def stm32_crc32(samples):
+    """CRC of a 1-D array of uint16 samples, as computed by calc_checksum."""
+    samples = np.asarray(samples, dtype=np.uint16)
+    length = len(samples)
+    _ensure_tables(length)
+    if length <= len(_distances):
+        distance = _distances[len(_distances) - length:]
+    else:
+        distance = np.arange(length - 1, -1, -1)
+    terms = _position_table[distance, 0, samples & 0xFF] ^ _position_table[distance, 1, samples >> 8]
+    return int(_init_table[length] ^ np.bitwise_xor.reduce(terms))
+
+
+def stm32_crc32_batch(samples, lengths):
+    """CRCs of many frames at once.
+
+    samples is an (n_frames, capacity) uint16 array and lengths gives the
+    number of valid samples in each row; anything past a row's length is
+    ignored.
+    """
+    samples = np.asarray(samples, dtype=np.uint16)
+    lengths = np.asarray(lengths, dtype=np.intp)
+    _ensure_tables(samples.shape[1])
+    distance = lengths[:, None] - 1 - np.arange(samples.shape[1])
+    valid = distance >= 0
+    distance = np.where(valid, distance, 0)
+    terms = _position_table[distance, 0, samples & 0xFF] ^ _position_table[distance, 1, samples >> 8]
+    terms[~valid] = 0
+    return _init_table[lengths] ^ np.bitwise_xor.reduce(terms, axis=1)
@@ -0,0 +1,169 @@
+import numpy as np
+
+
+def minmax_envelope(samples, buckets):
+    """Per-bucket min and max of samples split into `buckets` nearly equal runs.
+
+    Returns (starts, mins, maxs) where starts holds the index of the first
+    sample of each bucket.
+    """
+    n = len(samples)
+    buckets = max(1, min(int(buckets), n))
+    if n % buckets == 0:
+        runs = samples.reshape(buckets, n // buckets)
+        starts = np.arange(0, n, n // buckets)
+        return starts, runs.min(axis=1), runs.max(axis=1)
+    starts = (np.arange(buckets) * n) // buckets
+    return starts, np.minimum.reduceat(samples, starts), np.maximum.reduceat(samples, starts)
+
+
+def decimate_minmax(samples, width):
+    """Reduces samples to about 2 * width points for drawing.
+
+    Each pixel column gets its minimum and maximum, drawn as a vertical
+    stroke, so a one-sample spike survives however long the record is.
+    Returns (positions, values) with positions in sample units; short
+    windows are passed through untouched.
+    """
+    n = len(samples)
+    if width <= 0 or n <= 2 * width:
+        return np.arange(n), samples
+    starts, mins, maxs = minmax_envelope(samples, width)
+    positions = np.repeat(starts, 2)
+    values = np.empty(2 * len(starts), dtype=samples.dtype)
+    values[0::2] = mins
+    values[1::2] = maxs
+    return positions, values
+
+
+class MinMaxPyramid:
+    """Level-of-detail min/max cache over a RingBuffer.
+
+    Level k holds, for every channel, the min and max of each aligned run of
+    2**k samples, stored like the ring itself: mirrored and indexed by the
+    absolute block number modulo the level size, so any run of blocks is one
+    contiguous slice. update() only recomputes the blocks touched by samples
+    written since the last call, and query() answers a viewport from the
+    coarsest level that still has at least one block per pixel, so its cost
+    depends on the pixel width and not on the record length.
+    """
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.levels = []
+        k = 1
+        while ring.capacity % (1 << k) == 0 and ring.capacity >> k >= 2:
+            shape = (ring.channels, 2 * (ring.capacity >> k))
+            self.levels.append((np.empty(shape, ring.storage.dtype), np.empty(shape, ring.storage.dtype)))
+            k += 1
+        self.synced = 0
+        self.generation = ring.generation
+
+    @staticmethod
+    def _read(array, size, first, count):
+        start = first % size
+        return array[:, start:start + count]
+
+    @staticmethod
+    def _pairs(reduce, children, first):
+        """reduce over the aligned pairs of children, whose first column is
+        child number first; a pair cut off at either end is its one child."""
+        odd = first & 1
+        count = children.shape[1]
+        out = np.empty((children.shape[0], (first + count - 1) // 2 - first // 2 + 1), children.dtype)
+        if odd:
+            out[:, 0] = children[:, 0]
+        pairs = (count - odd) // 2
+        # Strided views, so each level is one elementwise pass
+        reduce(children[:, odd:odd + 2 * pairs:2], children[:, odd + 1:odd + 2 * pairs:2], out=out[:, odd:odd + pairs])
+        if (count - odd) % 2:
+            out[:, -1] = children[:, -1]
+        return out
+
+    @staticmethod
+    def _write(array, size, first, values):
+        count = values.shape[1]
+        if count > size:
+            values = values[:, count - size:]
+            first += count - size
+            count = size
+        start = first % size
+        head = min(count, size - start)
+        for base in (start, start + size):
+            array[:, base:base + head] = values[:, :head]
+        if head < count:
+            for base in (0, size):
+                array[:, base:base + count - head] = values[:, head:]
+
+    def invalidate(self):
+        # Samples were modified in place; rebuild everything on the next update
+        self.synced = 0
+
+    def update(self):
+        end = self.ring.total_written
+        if self.generation != self.ring.generation:
+            # The ring was cleared or rescaled
+            self.generation = self.ring.generation
+            self.synced = 0
+        if end == self.synced:
+            return
+        capacity = self.ring.capacity
+        child_lo = max(self.synced, end - capacity)
+        child_hi = end - 1
+        child_mins = child_maxs = self.ring.storage
+        for k, (mins, maxs) in enumerate(self.levels, 1):
+            child_size = capacity >> (k - 1)
+            # Oldest child that has not been overwritten yet
+            oldest = max((child_hi - child_size + 1), 0)
+            first = max(child_lo & ~1, oldest)
+            b_lo = first >> 1
+            b_hi = child_hi >> 1
+            count = child_hi - first + 1
+            block_mins = self._pairs(np.minimum, self._read(child_mins, child_size, first, count), first)
+            block_maxs = self._pairs(np.maximum, self._read(child_maxs, child_size, first, count), first)
+            size = capacity >> k
+            self._write(mins, size, b_lo, block_mins)
+            self._write(maxs, size, b_lo, block_maxs)
+            child_mins, child_maxs = mins, maxs
+            child_lo, child_hi = b_lo, b_hi
+        self.synced = end
+
+    def query(self, channel, start, end, width):
+        """Envelope of absolute samples [start, end) in about width buckets.
+
+        Returns (positions, values) like decimate_minmax, with positions in
+        samples relative to start. Blocks that stick out of [start, end)
+        at either edge are recomputed from the samples inside it.
+        """
+        self.update()
+        capacity = self.ring.capacity
+        start = max(start, end - capacity, 0)
+        span = end - start
+        if span <= 0:
+            return np.arange(0), self.ring.storage[channel, :0]
+        level = min((span // max(int(width), 1)).bit_length() - 1, len(self.levels))
+        if level <= 0:
+            offset = start % capacity
+            return decimate_minmax(self.ring.storage[channel, offset:offset + span], width)
+
+        mins, maxs = self.levels[level - 1]
+        size = capacity >> level
+        b_lo = max(start >> level, ((end - 1) >> level) - size + 1)
+        count = ((end - 1) >> level) - b_lo + 1
+        offset = b_lo % size
+        block_mins = mins[channel, offset:offset + count].copy()
+        block_maxs = maxs[channel, offset:offset + count].copy()
+        storage = self.ring.storage[channel]
+        for i, lo, hi in ((0, start, min((b_lo + 1) << level, end)),
+                          (count - 1, max((b_lo + count - 1) << level, start), end)):
+            if lo > (b_lo + i) << level or hi < (b_lo + i + 1) << level:
+                raw = storage[lo % capacity:lo % capacity + hi - lo]
+                block_mins[i] = raw.min()
+                block_maxs[i] = raw.max()
+        buckets = min(int(width), count)
+        starts = (np.arange(buckets) * count) // buckets
+        positions = np.repeat(np.maximum((b_lo + starts) << level, start) - start, 2)
+        values = np.empty(2 * buckets, dtype=mins.dtype)
+        values[0::2] = np.minimum.reduceat(block_mins, starts)
+        values[1::2] = np.maximum.reduceat(block_maxs, starts)
+        return positions, values
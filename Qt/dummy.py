@@ -12,55 +12,53 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import QTimer, QThread, pyqtSignal, Qt
 from PyQt6.QtGui import QColor
 
+from simulator import SignalGenerator, SignalSpec
+
 class SerialReader(QThread):
-    data_received = pyqtSignal(list)
+    data_received = pyqtSignal(object)
 
-    def __init__(self, channels=4, ch1_amplitude=2.5, mode='AC', impedance=1e6):
+    def __init__(self, channels=4, ch1_amplitude=2.5, mode='AC', impedance=1e6, block_size=10):
         super().__init__()
         self.channels = channels
         self.running = False  # Initialize as False
         self.sample_rate = 200
-        self.time_step = 0.0
+        self.block_size = block_size
         self.ch1_amplitude = ch1_amplitude
         self.mode = mode
         self.impedance = impedance
         self.coupling_modes = ['AC'] * channels
+        # CH1 at 1 Hz for clearer peaks, the other channels smaller at 0.5 Hz
+        specs = [SignalSpec('sine', frequency=1, amplitude=ch1_amplitude)]
+        specs += [SignalSpec('sine', frequency=0.5, amplitude=0.5, phase=i * np.pi / 2) for i in range(1, channels)]
+        self.generator = SignalGenerator(specs, sample_rate=self.sample_rate, seed=0)
+        # Running DC level per channel removed by AC coupling (1 s time constant)
+        self.dc_level = np.zeros(channels, dtype=np.float32)
 
     def run(self):
         self.running = True
+        start_time = time.monotonic()
+        start_position = self.generator.position
         while self.running:
-            dummy_data = []
-            # Generate CH1 data with larger amplitude
-            if self.mode == 'AC':
-                ch1_value = self.ch1_amplitude * np.sin(2 * np.pi * 1 * self.time_step)  # Changed to 1 Hz for clearer peaks
-            elif self.mode == 'DC':
-                ch1_value = self.ch1_amplitude * np.abs(np.sin(2 * np.pi * 1 * self.time_step))
+            self.generator.specs[0].amplitude = self.ch1_amplitude
+            block = self.generator.generate(self.block_size)
+            if self.mode == 'DC':
+                np.abs(block[0], out=block[0])
 
             # Apply impedance effect
             if self.impedance < 1e6:
-                attenuation_factor = self.impedance / 1e6
-                ch1_value *= attenuation_factor
-
-            # Apply coupling mode to CH1
-            if self.coupling_modes[0] == 'AC':
-                ch1_value -= np.mean([ch1_value])
-            elif self.coupling_modes[0] == 'GND':
-                ch1_value = 0.0
-
-            dummy_data.append(ch1_value)
-
-            # Generate other channels with smaller amplitudes
-            for i in range(1, self.channels):
-                value = 0.5 * np.sin(2 * np.pi * 0.5 * self.time_step + (i * np.pi/2))
-                if self.coupling_modes[i] == 'AC':
-                    value -= np.mean([value])
-                elif self.coupling_modes[i] == 'GND':
-                    value = 0.0
-                dummy_data.append(value)
-
-            self.data_received.emit(dummy_data)
-            self.time_step += 1.0 / self.sample_rate
-            time.sleep(1.0 / self.sample_rate)
+                block[0] *= self.impedance / 1e6
+
+            # Apply coupling mode per channel
+            self.dc_level += (block.mean(axis=1) - self.dc_level) * min(self.block_size / self.sample_rate, 1.0)
+            for i, coupling in enumerate(self.coupling_modes):
+                if coupling == 'AC':
+                    block[i] -= self.dc_level[i]
+                elif coupling == 'GND':
+                    block[i] = 0.0
+
+            self.data_received.emit(block)
+            due = start_time + (self.generator.position - start_position) / self.sample_rate
+            time.sleep(max(due - time.monotonic(), 0))
 
     def stop(self):
         self.running = False
@@ -702,14 +700,13 @@ class OscilloscopeApp(QMainWindow):
 
     def process_data(self, data):
         # Ensure data is being received
-        if not data:
+        if data is None or data.size == 0:
             return
             
         for i in range(min(len(data), len(self.data_buffer))):
-            self.data_buffer[i].append(data[i])
+            self.data_buffer[i].extend(data[i].tolist())
             # Keep buffer size limited
-            while len(self.data_buffer[i]) > self.max_samples:
-                self.data_buffer[i].pop(0)
+            del self.data_buffer[i][:-self.max_samples]
                 
         if self.is_running and self.plot_window:
             self.update_plot()
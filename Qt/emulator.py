@@ -0,0 +1,212 @@
+import logging
+import os
+import pty
+import select
+import threading
+import time
+import tty
+from collections import deque
+
+import numpy as np
+
+from SDO1 import CONVERSION_START, CONVERSION_STOP, TRIGGER_LEVEL, BAUD_RATE, RECV_ACK, NACK
+from crc import stm32_crc32
+from frame import FRAME_DTYPE, FRAME_SIZE, FRAME_CAPACITY, FRAME_HEADER, FRAME_FOOTER, FRAME_NO_TRIGGER
+from simulator import SignalGenerator, SignalSpec
+
+log = logging.getLogger('sdo.emulator')
+
+UART_WAITING_FOR_COMMAND = 0
+UART_WAITING_FOR_DATA = 1
+
+# Debug dump command handled by USART1_IRQHandler; it only prints on the
+# debug channel, so the emulator accepts it silently
+DEBUG_DUMP = 0x44
+
+
+class FirmwareEmulator:
+    """Pseudo-terminal that behaves like the STM32 board on its USART.
+
+    open() creates a pty whose slave end (port) serial.Serial can open like
+    a real device. Bytes written to it go through the command state machine
+    of USART1_IRQHandler: CONVERSION_START and CONVERSION_STOP start and
+    stop sampling, TRIGGER_LEVEL and BAUD_RATE take one data byte after
+    their ACK, which the firmware stores as the trigger level for both,
+    RECV_ACK and the debug dump are ignored and anything else is answered
+    with NACK. Like send_ack, replies are written immediately, even in the
+    middle of a frame.
+
+    While sampling, Frame_t packets of the generator's first channel are
+    streamed the way Transmit_Frame does it: two preallocated frames are
+    filled alternately, so one is being "DMA'd" out while the next is
+    prepared. frame_rate sets the pacing in frames per second; None paces
+    them at the wire speed of baudrate (10 bits per byte) and
+    0 writes as fast as the reader drains the pty.
+
+    The trigger level byte is scaled to 12 bits; once it has been set, the
+    first rising crossing in a frame is reported as its trigger_index, like
+    the EXTI trigger.
+    """
+
+    def __init__(self, generator=None, baudrate=9600, frame_rate=None, autostart=False, history=4096):
+        self.generator = generator or SignalGenerator([SignalSpec(offset=1.65)], sample_rate=100000)
+        self.baudrate = baudrate
+        self.frame_rate = frame_rate
+        self.autostart = autostart
+        self.history = history
+        self.master = None
+        self.slave = None
+        self.port = None
+        self.thread = None
+        self.running = False
+
+        self.tx_frames = np.zeros(2, dtype=FRAME_DTYPE)
+        self.tx_frames['header'] = FRAME_HEADER
+        self.tx_frames['footer'] = FRAME_FOOTER
+        self.tx_frames['length'] = FRAME_CAPACITY
+        self.current_frame = 0
+        self.reset()
+
+    def reset(self):
+        self.uart_state = UART_WAITING_FOR_COMMAND
+        self.keep_sampling = self.autostart
+        self.trigger_level = None
+        self.last_sample = None
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.commands = 0
+        self.nacks = 0
+        # Monotonic time at which each of the last history frames finished transmitting
+        self.sent_times = deque(maxlen=self.history)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        # The slave stays open here as well, so the master never sees EIO
+        # while no client has the port open
+        self.port = os.ttyname(self.slave)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="FirmwareEmulator", daemon=True)
+        self.thread.start()
+        return self.port
+
+    def close(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                os.close(fd)
+        self.master = self.slave = None
+
+    def frame_interval(self):
+        if self.frame_rate is None:
+            return FRAME_SIZE * 10 / self.baudrate
+        return 1 / self.frame_rate if self.frame_rate > 0 else 0.0
+
+    def run(self):
+        tx = None
+        due = time.monotonic()
+        while self.running:
+            now = time.monotonic()
+            if tx is None and self.keep_sampling and now >= due:
+                tx = memoryview(self.prepare_frame().view(np.uint8))
+                due = max(due + self.frame_interval(), now - 1.0)
+            if tx is not None:
+                timeout = 0.05
+            elif self.keep_sampling:
+                timeout = min(max(due - now, 0.0), 0.05)
+            else:
+                timeout = 0.05
+            readable, writable, _ = select.select([self.master], [self.master] if tx is not None else [], [], timeout)
+            if readable:
+                try:
+                    data = os.read(self.master, 256)
+                except (BlockingIOError, OSError):
+                    data = b''
+                for byte in data:
+                    self.handle(byte)
+            if tx is not None and writable:
+                try:
+                    written = os.write(self.master, tx)
+                except BlockingIOError:
+                    written = 0
+                self.bytes_sent += written
+                tx = tx[written:]
+                if len(tx) == 0:
+                    tx = None
+                    self.frames_sent += 1
+                    self.sent_times.append(time.monotonic())
+
+    def handle(self, byte):
+        self.commands += 1
+        if self.uart_state == UART_WAITING_FOR_DATA:
+            self.trigger_level = byte
+            self.uart_state = UART_WAITING_FOR_COMMAND
+            return
+        if byte == CONVERSION_START:
+            self.keep_sampling = True
+            self.reply(RECV_ACK)
+        elif byte == CONVERSION_STOP:
+            self.keep_sampling = False
+            self.reply(RECV_ACK)
+        elif byte in (TRIGGER_LEVEL, BAUD_RATE):
+            self.uart_state = UART_WAITING_FOR_DATA
+            self.reply(RECV_ACK)
+        elif byte in (RECV_ACK, DEBUG_DUMP):
+            pass
+        else:
+            self.nacks += 1
+            self.reply(NACK)
+
+    def reply(self, byte):
+        # The pty can be full while the client is not reading; wait for room
+        # rather than drop an ACK the client is waiting for
+        for _ in range(20):
+            try:
+                os.write(self.master, bytes((byte,)))
+                return
+            except BlockingIOError:
+                select.select([], [self.master], [], 0.05)
+        log.warning("Dropped reply 0x%02X: the port is not being read", byte)
+
+    def prepare_frame(self):
+        """Fills the idle one of the two frames and returns it for sending."""
+        frame = self.tx_frames[self.current_frame:self.current_frame + 1]
+        self.current_frame ^= 1
+        samples = self.generator.counts(FRAME_CAPACITY)
+        frame['data_array'][0] = samples
+        frame['trigger_index'] = self.find_trigger(samples)
+        frame['checksum'] = stm32_crc32(samples)
+        return frame
+
+    def find_trigger(self, samples):
+        index = FRAME_NO_TRIGGER
+        if self.trigger_level is not None:
+            level = self.trigger_level << 4
+            previous = np.concatenate(([samples[0] if self.last_sample is None else self.last_sample], samples[:-1]))
+            rising = np.flatnonzero((previous < level) & (samples >= level))
+            if len(rising):
+                index = int(rising[0])
+        self.last_sample = samples[-1]
+        return index
+
+
+if __name__ == '__main__':
+    # Streams as if sampling had already been started; open the printed port in the app
+    emulator = FirmwareEmulator(autostart=True)
+    print(f"Emulated oscilloscope on {emulator.open()}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.close()
@@ -0,0 +1,208 @@
+import numpy as np
+
+from crc import stm32_crc32, stm32_crc32_batch
+from instrument import instruments
+
+FRAME_HEADER = 0xAA55
+FRAME_FOOTER = 0x55AA
+FRAME_CAPACITY = 256
+# trigger_index of a frame that was captured without a hardware trigger
+FRAME_NO_TRIGGER = 0xFFFF
+# 12-bit ADC against a 3.3 V reference
+ADC_VOLTS_PER_COUNT = 3.3 / 4096
+
+# Wire layout of Frame_t (src/frame.h) as laid out by arm-none-eabi-gcc and
+# sent byte-for-byte by Start_DMA_Transmission. The uint32 checksum is 4-byte
+# aligned, so there are two padding bytes after data_array and two more at
+# the end of the struct.
+FRAME_DTYPE = np.dtype({
+    'names': ['header', 'length', 'trigger_index', 'data_array', 'checksum', 'footer'],
+    'formats': ['<u2', '<u2', '<u2', ('<u2', FRAME_CAPACITY), '<u4', '<u2'],
+    'offsets': [0, 2, 4, 6, 520, 524],
+    'itemsize': 528,
+})
+FRAME_SIZE = FRAME_DTYPE.itemsize
+
+HEADER_BYTES = FRAME_HEADER.to_bytes(2, "little")
+FOOTER_BYTES = FRAME_FOOTER.to_bytes(2, "little")
+LENGTH_OFFSET = FRAME_DTYPE.fields['length'][1]
+TRIGGER_OFFSET = FRAME_DTYPE.fields['trigger_index'][1]
+DATA_OFFSET = FRAME_DTYPE.fields['data_array'][1]
+CHECKSUM_OFFSET = FRAME_DTYPE.fields['checksum'][1]
+FOOTER_OFFSET = FRAME_DTYPE.fields['footer'][1]
+
+
+class Frame:
+    __slots__ = ('length', 'trigger_index', 'samples', 'checksum')
+
+    def __init__(self, length, trigger_index, samples, checksum):
+        self.length = length
+        self.trigger_index = trigger_index
+        self.samples = samples
+        self.checksum = checksum
+
+    def has_trigger(self):
+        return self.trigger_index < self.length
+
+
+class FrameDecoder:
+    """Splits a raw UART byte stream into Frame_t packets.
+
+    Bytes are copied into one preallocated receive buffer by read() or
+    feed(), so partial frames never need joining. pyserial's readinto()
+    reads into a temporary bytes object and copies it anyway, so read()
+    takes that bytes object directly and copies it once. A frame is only
+    accepted when the header, footer and length field all check out;
+    otherwise the decoder skips ahead to the next header and counts the
+    candidate as dropped. Well-framed frames whose CRC does not match are
+    counted as corrupt and skipped whole.
+
+    Frames are parsed in place: Frame.samples is a view into the receive
+    buffer and is only valid until the next frame is requested, so callers
+    must consume or copy it before moving on.
+    """
+
+    def __init__(self, verify_checksum=True, capacity=64 * 1024):
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.bytes = np.frombuffer(self.buffer, dtype=np.uint8)
+        self.start = 0
+        self.end = 0
+        self.verify_checksum = verify_checksum
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.frames_corrupt = 0
+        self.resyncs = 0
+        self.bytes_discarded = 0
+
+    def reset(self):
+        self.start = 0
+        self.end = 0
+
+    def reset_stats(self):
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.frames_corrupt = 0
+        self.resyncs = 0
+        self.bytes_discarded = 0
+
+    @property
+    def corrupt_ratio(self):
+        total = self.frames_decoded + self.frames_corrupt
+        return self.frames_corrupt / total if total else 0.0
+
+    @property
+    def pending(self):
+        return self.end - self.start
+
+    def free_space(self):
+        return len(self.buffer) - self.pending
+
+    def _make_room(self, size):
+        if len(self.buffer) - self.end >= size:
+            return
+        # Slide the unparsed tail to the front of the buffer
+        pending = self.pending
+        self.bytes[:pending] = self.bytes[self.start:self.end]
+        self.start = 0
+        self.end = pending
+
+    def read(self, port, size):
+        """Reads up to size bytes from port into the receive buffer and
+        yields the frames that became complete."""
+        size = min(size, self.free_space())
+        self._make_room(size)
+        data = port.read(size)
+        self.view[self.end:self.end + len(data)] = data
+        self.end += len(data)
+        return self.decode()
+
+    def feed(self, data):
+        data = memoryview(data)
+        while len(data):
+            size = min(len(data), self.free_space())
+            self._make_room(size)
+            self.view[self.end:self.end + size] = data[:size]
+            self.end += size
+            data = data[size:]
+            yield from self.decode()
+
+    def decode(self):
+        buf = self.buffer
+        search = self.start
+        while True:
+            start = buf.find(HEADER_BYTES, search, self.end)
+            if start < 0:
+                # Keep a trailing half header byte, drop everything else
+                start = self.end
+                if self.end > self.start and buf[self.end - 1] == HEADER_BYTES[0]:
+                    start -= 1
+                self._discard(start - self.start)
+                self.start = start
+                return
+            self._discard(start - self.start)
+            self.start = search = start
+            if self.end - start < FRAME_SIZE:
+                return
+
+            length = buf[start + LENGTH_OFFSET] | buf[start + LENGTH_OFFSET + 1] << 8
+            footer_ok = buf[start + FOOTER_OFFSET] == FOOTER_BYTES[0] and \
+                buf[start + FOOTER_OFFSET + 1] == FOOTER_BYTES[1]
+            if not footer_ok or not 0 < length <= FRAME_CAPACITY:
+                # False header match or corrupted frame: resync on the next header
+                self.frames_dropped += 1
+                search = start + 1
+                continue
+
+            frame = self._parse(start, length)
+            self.start = search = start + FRAME_SIZE
+            if self.verify_checksum:
+                start = instruments.clock()
+                valid = stm32_crc32(frame.samples) == frame.checksum
+                instruments.record('crc', start)
+                if not valid:
+                    self.frames_corrupt += 1
+                    continue
+            self.frames_decoded += 1
+            yield frame
+
+    def _discard(self, count):
+        if count > 0:
+            self.resyncs += 1
+            self.bytes_discarded += count
+
+    def _parse(self, start, length):
+        buf = self.buffer
+        trigger_index = buf[start + TRIGGER_OFFSET] | buf[start + TRIGGER_OFFSET + 1] << 8
+        checksum = int.from_bytes(self.view[start + CHECKSUM_OFFSET:start + CHECKSUM_OFFSET + 4], "little")
+        samples = np.frombuffer(buf, dtype='<u2', count=length, offset=start + DATA_OFFSET)
+        return Frame(length, trigger_index, samples, checksum)
+
+
+def verify_frames(raw):
+    """Checks a run of back-to-back frames in one call.
+
+    raw is either bytes holding whole frames or an array of FRAME_DTYPE
+    records; returns a boolean mask of frames whose framing and CRC are good.
+    """
+    if not isinstance(raw, np.ndarray):
+        raw = np.frombuffer(raw, dtype=FRAME_DTYPE, count=len(raw) // FRAME_SIZE)
+    lengths = raw['length'].astype(np.intp)
+    framed = (raw['header'] == FRAME_HEADER) & (raw['footer'] == FRAME_FOOTER) & \
+             (lengths > 0) & (lengths <= FRAME_CAPACITY)
+    crcs = stm32_crc32_batch(raw['data_array'], np.where(framed, lengths, 0))
+    return framed & (crcs == raw['checksum'])
+
+
+def encode_frame(samples, trigger_index=FRAME_NO_TRIGGER, checksum=None):
+    samples = np.asarray(samples, dtype=np.uint16)
+    if checksum is None:
+        checksum = stm32_crc32(samples)
+    frame = np.zeros(1, dtype=FRAME_DTYPE)
+    frame['header'] = FRAME_HEADER
+    frame['length'] = len(samples)
+    frame['trigger_index'] = trigger_index
+    frame['data_array'][0, :len(samples)] = samples
+    frame['checksum'] = checksum
+    frame['footer'] = FRAME_FOOTER
+    return frame.tobytes()
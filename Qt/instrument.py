@@ -0,0 +1,145 @@
+import bisect
+import logging
+import threading
+import time
+
+import numpy as np
+
+log = logging.getLogger('sdo.pipeline')
+
+# Pipeline stages timed by the reader (read, decode, crc) and the GUI thread (the rest)
+STAGES = ['read', 'decode', 'crc', 'buffer', 'trigger', 'measure', 'render']
+# Stages whose time is mostly spent waiting for input rather than working
+WAIT_STAGES = {'read'}
+
+
+class Histogram:
+    """Durations in log-spaced bins, 8 per decade from 1 us to 10 s.
+
+    record() is one bisect and a few additions, cheap enough to run for
+    every frame; percentiles are read back as the upper edge of their bin.
+    """
+    EDGES = np.logspace(-6, 1, 57).tolist()
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.EDGES, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.EDGES[min(i, len(self.EDGES) - 1)], self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': 1000 * self.total / self.count if self.count else 0.0,
+            'p50_ms': 1000 * self.percentile(50),
+            'p99_ms': 1000 * self.percentile(99),
+            'max_ms': 1000 * self.max,
+        }
+
+
+class Instrumentation:
+    """Per-stage timing histograms, event counters and gauges shared by the
+    reader thread and the GUI.
+
+    Stages are timed with start = clock() ... record(stage, start); counts
+    accumulate until the next snapshot(), which turns them into rates, and
+    gauges keep the last value set (queue depths and the like). Disabled
+    instrumentation costs one attribute check per call.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.stages = {name: Histogram() for name in STAGES}
+        self.counters = {}
+        self.gauges = {}
+        self.window_start = time.perf_counter()
+
+    clock = staticmethod(time.perf_counter)
+
+    def record(self, stage, start):
+        if self.enabled:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage, seconds):
+        if self.enabled:
+            with self.lock:
+                histogram = self.stages.get(stage)
+                if histogram is None:
+                    histogram = self.stages[stage] = Histogram()
+                histogram.record(seconds)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def reset(self):
+        with self.lock:
+            self._clear()
+
+    def _clear(self):
+        for histogram in self.stages.values():
+            histogram.reset()
+        self.counters = {}
+        self.window_start = time.perf_counter()
+
+    def snapshot(self, reset=True):
+        """Stage timings, counter totals and rates per second, and gauges
+        since the last snapshot."""
+        with self.lock:
+            span = max(time.perf_counter() - self.window_start, 1e-9)
+            result = {
+                'interval_s': span,
+                'stages': {name: h.summary() for name, h in self.stages.items() if h.count},
+                'counters': dict(self.counters),
+                'rates': {name: n / span for name, n in self.counters.items()},
+                'gauges': dict(self.gauges),
+            }
+            if reset:
+                self._clear()
+        return result
+
+    def bottleneck(self, snapshot):
+        """Stage with the most time spent working in the snapshot, or None."""
+        busy = {name: s['mean_ms'] * s['count'] for name, s in snapshot['stages'].items() if name not in WAIT_STAGES}
+        return max(busy, key=busy.get) if busy else None
+
+    def publish(self, level=logging.DEBUG):
+        """Takes a snapshot and logs it as one structured record; returns it."""
+        snapshot = self.snapshot()
+        if log.isEnabledFor(level):
+            stages = ' '.join(f"{name}={s['mean_ms']:.3f}/{s['p99_ms']:.3f}ms" for name, s in snapshot['stages'].items())
+            rates = ' '.join(f"{name}={rate:.0f}/s" for name, rate in snapshot['rates'].items())
+            gauges = ' '.join(f"{name}={value}" for name, value in snapshot['gauges'].items())
+            log.log(level, "stages %s | %s | %s", stages, rates, gauges, extra={'pipeline': snapshot})
+        return snapshot
+
+
+# Shared by every module of the pipeline
+instruments = Instrumentation()
@@ -1,28 +1,78 @@
 import sys
+import os
+import logging
 import serial
 import serial.tools.list_ports
 import numpy as np
-import pandas as pd
 import pyqtgraph as pg
 import pyqtgraph.exporters
 import time
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QLabel,
     QComboBox, QSpinBox, QTabWidget, QFileDialog, QHBoxLayout, QCheckBox,
-    QDoubleSpinBox, QSlider, QGroupBox, QFormLayout, QScrollArea
+    QDoubleSpinBox, QSlider, QGroupBox, QFormLayout, QScrollArea, QInputDialog
 )
-from PyQt6.QtCore import QTimer, QThread, pyqtSignal, Qt
+from PyQt6.QtCore import QThread, pyqtSignal, Qt, QRectF
 from PyQt6.QtGui import QColor
 
 from SDO1 import *
+from frame import FrameDecoder, FRAME_SIZE, FRAME_CAPACITY, ADC_VOLTS_PER_COUNT
+from bufferpool import BlockPool, InFlightLimit
+from recorder import WaveformRecorder
+from segments import SegmentTable
+from persistence import PersistenceMap
+from playback import PlaybackReader
+from decimate import decimate_minmax, MinMaxPyramid
+from measure import measure_frequency, MeasurementEngine
+from ringbuffer import RingBuffer
+from render import RenderScheduler
+from trigger import EdgeTrigger, PulseWidthTrigger, RuntTrigger, WindowTrigger, TriggerEngine
+from spectrum import SpectrumWorker, Spectrogram, FFT_SIZES, WINDOWS, AVERAGING_MODES
+from instrument import instruments
+from analysis import AnalysisExecutor
+from simulator import SimulatorReader, SignalGenerator, SignalSpec
+
+log = logging.getLogger('sdo')
+
+SIMULATOR_PORT = "Simulator"
+
+# Memory segmented mode may use for its segments
+SEGMENT_BUDGET = 64 << 20
+
+# Test pattern of the simulated source: one signal per channel around mid-scale
+SIMULATOR_SPECS = [
+    SignalSpec('sine', frequency=1000, amplitude=1.0, offset=1.65, noise=0.005),
+    SignalSpec('square', frequency=250, amplitude=0.8, offset=1.65, noise=0.005),
+    SignalSpec('sawtooth', frequency=500, amplitude=0.5, offset=1.65, noise=0.02),
+    SignalSpec('pwm', frequency=2000, amplitude=2.0, offset=0.5, duty=0.25, glitch_rate=5,
+               glitch_amplitude=0.6, glitch_width=3),
+]
 
 class SerialReader(QThread):
-    data_received = pyqtSignal(list)
+    # (samples as a (channels, n) float32 array in volts, sequence number, time.monotonic())
+    data_received = pyqtSignal(object, int, float)
+    # (sequence number of the block, trigger position within it), sent just before the block
+    trigger_received = pyqtSignal(int, int)
 
-    def __init__(self, port, baudrate, channels=4, ch1_amplitude=2.5, mode='AC', impedance=1e6):
+    def __init__(self, port, baudrate, channels=4, ch1_amplitude=2.5, mode='AC', impedance=1e6, protocol='binary',
+                 chunk_size=256, chunk_interval=0.02, read_timeout=0.05, max_in_flight=32):
         super().__init__()
         self.channels = channels
         self.running = False
+        self.protocol = protocol
+        self.decoder = FrameDecoder()
+        # Decoded frames are handed out in recycled blocks; the consumer releases them
+        self.block_pool = BlockPool((1, FRAME_CAPACITY))
+        # Bytes wait in the port's buffer rather than as blocks in the event queue
+        self.in_flight = InFlightLimit(max_in_flight)
+        # ASCII samples are batched until chunk_size rows or chunk_interval seconds
+        self.chunk_size = chunk_size
+        self.chunk_interval = chunk_interval
+        self.pending = []
+        self.pending_since = 0.0
+        self.sequence = 0
+        self.read_timeout = read_timeout
+        self.line_buffer = bytearray()
         self.port = port
         self.baudrate = baudrate
         self.byte_size = serial.EIGHTBITS
@@ -33,39 +83,116 @@ class SerialReader(QThread):
         self.impedance = impedance
         try:
             self.ser = SDO_Connect(port, baudrate, serial.EIGHTBITS, serial.PARITY_NONE, serial.STOPBITS_ONE)
-            print(f"Connected to Oscilloscope: Port {port} at {baudrate} baud")
+            # Block in read() for at most read_timeout instead of polling in_waiting
+            if self.ser:
+                self.ser.timeout = read_timeout
+            log.info("Connected to Oscilloscope: Port %s at %s baud", port, baudrate)
         except serial.SerialException as e:
-            print(f"Error opening serial port: {e}")
+            log.error("Error opening serial port: %s", e)
             self.ser = None
 
     def run(self):
         if self.ser:
             self.running = True
-            print("Starting serial data acquisition")
+            log.info("Starting serial data acquisition")
             while self.running:
                 try:
-                    if self.ser.in_waiting > 0:
-                        serial_data = self.ser.readline().decode('utf-8').strip()
-                        try:
-                            data = [(float(val) * (3.3/4096)) for val in serial_data.split(',')]
-                            # Simulate impedance effect if impedance is not infinite (very high resistance)
-                            if self.impedance < float('inf'):
-                                if self.impedance < 1e6:  # Example: consider it low when below 1 MΩ
-                                    attenuation_factor = self.impedance / 1e6  # Attenuate more as impedance decreases
-                                    data[0] *= attenuation_factor
-                            self.data_received.emit(data)
-                        except ValueError:
-                            print(f"Invalid data received: {serial_data}")
+                    # Wait for at least one frame worth of bytes, but take everything already queued
+                    size = self.ser.in_waiting or FRAME_SIZE
+                    if not self.in_flight.wait(self.read_timeout):
+                        continue
+                    if self.protocol == 'binary':
+                        # No more frames than the consumer has room for
+                        size = min(size, (self.in_flight.limit - self.in_flight.pending) * FRAME_SIZE)
+                        start = instruments.clock()
+                        pending = self.decoder.pending
+                        frames = self.decoder.read(self.ser, size)
+                        instruments.record('read', start)
+                        instruments.count('bytes_read', self.decoder.pending - pending)
+                        start = instruments.clock()
+                        for frame in frames:
+                            block = self.frame_to_volts(frame.samples)
+                            # Time to find, check and convert this frame
+                            instruments.record('decode', start)
+                            if frame.has_trigger():
+                                self.trigger_received.emit(self.sequence, frame.trigger_index)
+                            self.emit_block(block)
+                            start = instruments.clock()
+                    else:
+                        data = self.ser.read(size)
+                        if data:
+                            self.parse_lines(data)
+                    self.flush_pending()
                 except serial.SerialException as e:
-                    print(f"Serial read error: {e}")
+                    log.error("Serial read error: %s", e)
                     self.running = False
 
+    def parse_lines(self, data):
+        self.line_buffer += data
+        end = self.line_buffer.rfind(b'\n')
+        if end < 0:
+            return
+        lines = self.line_buffer[:end].split(b'\n')
+        del self.line_buffer[:end + 1]
+        for line in lines:
+            serial_data = line.decode('utf-8', errors='replace').strip()
+            if not serial_data:
+                continue
+            try:
+                data = [(float(val) * (3.3/4096)) for val in serial_data.split(',')]
+                # Simulate impedance effect if impedance is not infinite (very high resistance)
+                if self.impedance < float('inf'):
+                    if self.impedance < 1e6:  # Example: consider it low when below 1 MΩ
+                        attenuation_factor = self.impedance / 1e6  # Attenuate more as impedance decreases
+                        data[0] *= attenuation_factor
+                self.queue_sample(data)
+            except ValueError:
+                log.warning("Invalid data received: %s", serial_data)
+
+    def emit_block(self, block):
+        self.in_flight.sent()
+        self.data_received.emit(block, self.sequence, time.monotonic())
+        self.sequence += 1
+
+    def release(self, block):
+        self.block_pool.release(block)
+        self.in_flight.release()
+
+    def queue_sample(self, data):
+        if self.pending and len(data) != len(self.pending[0]):
+            self.flush_pending(force=True)
+        if not self.pending:
+            self.pending_since = time.monotonic()
+        self.pending.append(data)
+
+    def flush_pending(self, force=False):
+        if not self.pending:
+            return
+        if force or len(self.pending) >= self.chunk_size or \
+                time.monotonic() - self.pending_since >= self.chunk_interval:
+            block = np.array(self.pending, dtype=np.float32).T
+            self.pending = []
+            self.emit_block(block)
+
+    def volts_per_count(self):
+        scale = ADC_VOLTS_PER_COUNT
+        if self.impedance < 1e6:
+            scale *= self.impedance / 1e6
+        return scale
+
+    def frame_to_volts(self, samples):
+        block = self.block_pool.acquire()[:, :len(samples)]
+        np.multiply(samples, np.float32(self.volts_per_count()), out=block[0])
+        return block
+
     def stop(self):
         self.running = False
-        if self.ser:
-            self.ser.close()
+        # The read loop notices within read_timeout; close the port only after it has exited
         self.quit()
         self.wait()
+        self.flush_pending(force=True)
+        if self.ser:
+            self.ser.close()
 
     def set_ch1_amplitude(self, amplitude):
         self.ch1_amplitude = amplitude
@@ -73,9 +200,9 @@ class SerialReader(QThread):
             try:
                 command = f"CH1AMP,{amplitude:.1f}\n"
                 self.ser.write(command.encode('utf-8'))
-                print(f"Set CH1 amplitude to {amplitude}V")
+                log.info("Set CH1 amplitude to %sV", amplitude)
             except serial.SerialException as e:
-                print(f"Error setting CH1 amplitude: {e}")
+                log.error("Error setting CH1 amplitude: %s", e)
 
     def set_impedance(self, impedance):
         self.impedance = impedance
@@ -94,17 +221,41 @@ class PlotWindow(QMainWindow):
         self.setCentralWidget(self.plot_widget)
         colors = ['#FF0000', '#00FF00', '#33CCFF', '#FFFF00']
         self.traces = [self.plot_widget.plot([], [], pen=pg.mkPen(color=color, width=2)) for color in colors]
-
-    def update_plot(self, data_buffer, channel_active, time_div, voltage_div, display_window, sample_rate, channel_positions, horizontal_position, probe_attenuation):
+        self.persistence_image = pg.ImageItem()
+        self.persistence_image.setColorMap(pg.colormap.get('inferno'))
+        self.persistence_image.setZValue(-1)
+        self.persistence_image.hide()
+        self.plot_widget.addItem(self.persistence_image)
+        # Performance overlay in the top-left corner of the plot
+        self.hud = QLabel(self.plot_widget)
+        self.hud.setStyleSheet("color: #9FE870; background-color: rgba(0, 0, 0, 160); "
+                               "font-family: monospace; padding: 4px;")
+        self.hud.move(60, 10)
+        self.hud.hide()
+
+    def update_plot(self, data_buffer, channel_active, time_div, voltage_div, display_window, sample_rate, channel_positions, horizontal_position, probe_attenuation, pyramid=None, end=None, phase=0.0):
+        # end is the absolute sample index the sweep stops at (the newest
+        # sample by default) and phase the fraction of a sample by which the
+        # trigger point lies after the sample it is aligned to
         sample_duration_ms = 1000 / sample_rate  
         display_window_ms = time_div * 100
+        # Two points (min and max) per horizontal pixel is all the screen can show
+        width = self.plot_widget.getViewBox().width() or self.plot_widget.width()
+        total = data_buffer.total_written
+        end = total if end is None else min(end, total)
 
         for i, trace in enumerate(self.traces):
-            if channel_active[i] and data_buffer[i]:
-                num_points = min(len(data_buffer[i]), display_window)
-                x_values = np.linspace(0, display_window_ms, num_points)
+            start = max(end - display_window, total - data_buffer.count(i))
+            if channel_active[i] and end > start:
+                num_points = end - start
+                if pyramid is not None:
+                    positions, values = pyramid.query(i, start, end, int(width))
+                else:
+                    samples = data_buffer.latest(total - start, i)[:num_points]
+                    positions, values = decimate_minmax(samples, int(width))
+                x_values = (positions - phase) * (display_window_ms / max(num_points - 1, 1))
                 x_values += horizontal_position * sample_duration_ms
-                y_values = np.array(data_buffer[i][-num_points:]) * voltage_div / probe_attenuation + channel_positions[i]
+                y_values = values * (voltage_div / probe_attenuation) + channel_positions[i]
                 trace.setData(x_values, y_values)
             else:
                 trace.setData([], [])
@@ -112,13 +263,64 @@ class PlotWindow(QMainWindow):
         self.plot_widget.setXRange(horizontal_position * sample_duration_ms,
                                    horizontal_position * sample_duration_ms + display_window_ms)
 
+    def show_hud(self, text):
+        if text:
+            self.hud.setText(text)
+            self.hud.adjustSize()
+            self.hud.show()
+        else:
+            self.hud.hide()
+
+    def show_persistence(self, persistence, intensity):
+        for trace in self.traces:
+            trace.setData([], [])
+        image = persistence.image()
+        peak = float(image.max()) or 1.0
+        # Higher intensity saturates the colour map at a lower hit count
+        self.persistence_image.setImage(image, autoLevels=False, levels=(0, peak * (1.1 - intensity)))
+        x0, x1, y0, y1 = persistence.range
+        self.persistence_image.setRect(QRectF(x0, y0, x1 - x0, y1 - y0))
+        self.persistence_image.show()
+
+    def show_segments(self, segments, indices, channel_active, time_div, voltage_div, channel_positions, probe_attenuation):
+        # All selected segments of a channel go into its one trace, separated
+        # by NaN and shifted so their trigger points coincide
+        display_window_ms = time_div * 100
+        scale = display_window_ms / max(segments.length - 1, 1)
+        pre = segments.length // 2
+        shift = segments.offsets(indices) - pre
+        x = (np.arange(segments.length + 1)[None, :] - shift[:, None]) * scale
+        for i, trace in enumerate(self.traces):
+            if channel_active[i] and len(indices):
+                y = np.full((len(indices), segments.length + 1), np.nan, dtype=np.float32)
+                y[:, :-1] = segments.channel(i, indices) * (voltage_div / probe_attenuation) + channel_positions[i]
+                trace.setData(x.ravel(), y.ravel(), connect='finite')
+            else:
+                trace.setData([], [])
+        self.plot_widget.setXRange(0, display_window_ms)
+
 class OscilloscopeApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Digital Oscilloscope")
         self.setGeometry(100, 100, 1200, 800)
-        self.data_buffer = [[] for _ in range(4)]
-        self.max_samples = 500
+        self.max_samples = 1 << 20
+        self.data_buffer = RingBuffer(4, self.max_samples)
+        # Brought up to date lazily, once per redraw, by its queries
+        self.pyramid = MinMaxPyramid(self.data_buffer)
+        self.measurements = MeasurementEngine(self.data_buffer)
+        self.spectrogram = Spectrogram(self.data_buffer)
+        self.trigger_engine = TriggerEngine()
+        self.trigger_source = 0
+        self.hardware_trigger_usable = False
+        self.hardware_trigger = None
+        self.segmented = False
+        self.segments = None
+        # Trigger times waiting for their post-trigger samples
+        self.segment_pending = []
+        self.persistence_enabled = False
+        self.persistence = PersistenceMap()
+        self.persistence_cursor = None
         self.display_window = 500
         self.sample_rate = 100
         self.serial_thread = None
@@ -130,9 +332,17 @@ class OscilloscopeApp(QMainWindow):
         self.ch1_amplitude = 2.5
         self.probe_attenuation = 1.0
         self.impedance = 1e6
+        self.refresh_rate = 30
+        self.recorder = None
+        self.render_scheduler = RenderScheduler(self.update_plot, fps=self.refresh_rate, parent=self)
+        self.render_scheduler.stats_updated.connect(self.show_render_stats)
+        self.spectrum_worker = SpectrumWorker()
+        self.spectrum_worker.spectrum_ready.connect(self.show_spectrum)
+        # Worker-process analysis, when enabled; measurements are resubmitted only for new data
+        self.analysis = None
+        self.analysis_key = None
         self.initUI()
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_plot)
+        self.spectrum_worker.start()
 
     def initUI(self):
         self.setStyleSheet("""
@@ -218,6 +428,22 @@ class OscilloscopeApp(QMainWindow):
         self.grid_check.setChecked(True)
         self.grid_check.stateChanged.connect(self.toggle_grid)
         display_layout.addRow(self.grid_check)
+        self.refresh_rate_spinbox = QSpinBox()
+        self.refresh_rate_spinbox.setRange(1, 120)
+        self.refresh_rate_spinbox.setValue(self.refresh_rate)
+        self.refresh_rate_spinbox.valueChanged.connect(self.update_refresh_rate)
+        display_layout.addRow("Refresh Rate (FPS):", self.refresh_rate_spinbox)
+        self.persistence_check = QCheckBox("Persistence")
+        self.persistence_check.stateChanged.connect(self.toggle_persistence)
+        display_layout.addRow(self.persistence_check)
+        self.persistence_spinbox = QDoubleSpinBox()
+        self.persistence_spinbox.setRange(0.05, 60)
+        self.persistence_spinbox.setValue(self.persistence.time_constant)
+        self.persistence_spinbox.valueChanged.connect(self.update_persistence_time)
+        display_layout.addRow("Persistence (s):", self.persistence_spinbox)
+        self.hud_check = QCheckBox("Performance HUD")
+        self.hud_check.stateChanged.connect(self.toggle_hud)
+        display_layout.addRow(self.hud_check)
         display_group.setLayout(display_layout)
         self.main_layout.addWidget(display_group)
 
@@ -303,16 +529,42 @@ class OscilloscopeApp(QMainWindow):
         """)
         self.horiz_pos_slider.valueChanged.connect(self.update_horizontal_position)
         horizontal_layout.addRow("Position:", self.horiz_pos_slider)
+        self.display_window_spinbox = QSpinBox()
+        self.display_window_spinbox.setRange(10, self.max_samples)
+        self.display_window_spinbox.setSingleStep(500)
+        self.display_window_spinbox.setValue(self.display_window)
+        self.display_window_spinbox.valueChanged.connect(self.update_display_window)
+        horizontal_layout.addRow("Window (samples):", self.display_window_spinbox)
         horizontal_group.setLayout(horizontal_layout)
         self.main_layout.addWidget(horizontal_group)  # Changed to self.main_layout
         
         # Trigger Controls
         trigger_group = QGroupBox("Trigger Controls")
         trigger_layout = QFormLayout()
+        self.trigger_type_combo = QComboBox()
+        self.trigger_type_combo.addItems(["Edge", "Pulse Width", "Glitch", "Runt", "Window"])
+        trigger_layout.addRow("Type:", self.trigger_type_combo)
         self.trigger_spinbox = QDoubleSpinBox()
         self.trigger_spinbox.setRange(0, 5000)
         self.trigger_spinbox.setValue(2500)
         trigger_layout.addRow("Trigger Level:", self.trigger_spinbox)
+        # Runt and window triggers use the trigger level as their lower threshold
+        self.trigger_upper_spinbox = QDoubleSpinBox()
+        self.trigger_upper_spinbox.setRange(0, 5000)
+        self.trigger_upper_spinbox.setValue(3000)
+        trigger_layout.addRow("Upper Level (mV):", self.trigger_upper_spinbox)
+        self.trigger_condition_combo = QComboBox()
+        self.trigger_condition_combo.addItems(["<", ">", "Range"])
+        trigger_layout.addRow("Width Condition:", self.trigger_condition_combo)
+        self.trigger_min_width_spinbox = QDoubleSpinBox()
+        self.trigger_min_width_spinbox.setRange(0, 10000)
+        self.trigger_min_width_spinbox.setDecimals(3)
+        trigger_layout.addRow("Min Width (ms):", self.trigger_min_width_spinbox)
+        self.trigger_max_width_spinbox = QDoubleSpinBox()
+        self.trigger_max_width_spinbox.setRange(0, 10000)
+        self.trigger_max_width_spinbox.setDecimals(3)
+        self.trigger_max_width_spinbox.setValue(10)
+        trigger_layout.addRow("Max Width (ms):", self.trigger_max_width_spinbox)
         self.trigger_mode_combo = QComboBox()
         self.trigger_mode_combo.addItems(["Auto", "Normal", "Single"])
         self.trigger_mode_combo.currentTextChanged.connect(self.update_trigger_mode)
@@ -327,6 +579,24 @@ class OscilloscopeApp(QMainWindow):
         self.trigger_holdoff_spinbox.setRange(0, 1000)
         self.trigger_holdoff_spinbox.setValue(0)
         trigger_layout.addRow("Holdoff (ms):", self.trigger_holdoff_spinbox)
+        self.hardware_trigger_checkbox = QCheckBox("Use hardware trigger")
+        self.hardware_trigger_checkbox.setChecked(True)
+        trigger_layout.addRow(self.hardware_trigger_checkbox)
+        self.trigger_hysteresis_spinbox = QDoubleSpinBox()
+        self.trigger_hysteresis_spinbox.setRange(0, 1000)
+        self.trigger_hysteresis_spinbox.setValue(50)
+        trigger_layout.addRow("Hysteresis (mV):", self.trigger_hysteresis_spinbox)
+        self.trigger_arm_button = QPushButton("Arm Single")
+        self.trigger_arm_button.setStyleSheet("background-color: #9E9E9E; color: white; padding: 10px;")
+        self.trigger_arm_button.clicked.connect(self.trigger_engine.arm)
+        trigger_layout.addRow(self.trigger_arm_button)
+        for spinbox in (self.trigger_spinbox, self.trigger_holdoff_spinbox, self.trigger_hysteresis_spinbox,
+                        self.trigger_upper_spinbox, self.trigger_min_width_spinbox, self.trigger_max_width_spinbox):
+            spinbox.valueChanged.connect(self.configure_trigger)
+        for combo in (self.trigger_type_combo, self.trigger_source_combo, self.trigger_slope_combo,
+                      self.trigger_condition_combo):
+            combo.currentIndexChanged.connect(self.configure_trigger)
+        self.configure_trigger()
         trigger_group.setLayout(trigger_layout)
         self.main_layout.addWidget(trigger_group)
 
@@ -351,6 +621,22 @@ class OscilloscopeApp(QMainWindow):
         measure_layout.addWidget(self.measure_freq)
         self.measure_rms = QLabel("RMS Voltage: N/A")
         measure_layout.addWidget(self.measure_rms)
+        # Remaining measurements of the channel picked in Vertical Controls
+        self.measure_labels = {}
+        self.measure_units = {}
+        measure_grid = QFormLayout()
+        for key, name, unit in [('vpp', "Vpp", 'V'), ('vmax', "Vmax", 'V'), ('vmin', "Vmin", 'V'),
+                                ('mean', "Mean", 'V'), ('ac_rms', "AC RMS", 'V'), ('period', "Period", 's'),
+                                ('duty_cycle', "Duty Cycle", '%'), ('pulse_width', "Pulse Width", 's'),
+                                ('rise_time', "Rise Time", 's'), ('fall_time', "Fall Time", 's'),
+                                ('overshoot', "Overshoot", '%')]:
+            self.measure_labels[key] = QLabel("N/A")
+            self.measure_units[key] = unit
+            measure_grid.addRow(f"{name}:", self.measure_labels[key])
+        measure_layout.addLayout(measure_grid)
+        self.offload_check = QCheckBox("Analyze in Worker Processes")
+        self.offload_check.stateChanged.connect(self.toggle_offload)
+        measure_layout.addWidget(self.offload_check)
         measure_group.setLayout(measure_layout)
         self.main_layout.addWidget(measure_group)
 
@@ -388,6 +674,53 @@ class OscilloscopeApp(QMainWindow):
         utility_group.setLayout(utility_layout)
         self.main_layout.addWidget(utility_group)
 
+        # Playback Controls
+        playback_group = QGroupBox("Playback")
+        playback_layout = QHBoxLayout()
+        self.open_capture_button = QPushButton("Open Capture")
+        self.open_capture_button.setStyleSheet("background-color: #5E35B1; color: white; padding: 10px;")
+        self.open_capture_button.clicked.connect(self.open_capture)
+        playback_layout.addWidget(self.open_capture_button)
+        self.playback_speed_combo = QComboBox()
+        self.playback_speed_combo.addItems(["1x", "10x", "100x", "Max", "Scrub"])
+        self.playback_speed_combo.currentTextChanged.connect(self.update_playback_speed)
+        playback_layout.addWidget(QLabel("Speed:"))
+        playback_layout.addWidget(self.playback_speed_combo)
+        self.playback_slider = QSlider(Qt.Orientation.Horizontal)
+        self.playback_slider.setRange(0, 1000)
+        self.playback_slider.setEnabled(False)
+        self.playback_slider.sliderMoved.connect(self.seek_playback)
+        playback_layout.addWidget(self.playback_slider)
+        playback_group.setLayout(playback_layout)
+        self.main_layout.addWidget(playback_group)
+
+        # Segmented Memory
+        segment_group = QGroupBox("Segmented Memory")
+        segment_layout = QFormLayout()
+        self.segmented_checkbox = QCheckBox("Segmented Mode")
+        self.segmented_checkbox.stateChanged.connect(self.toggle_segmented)
+        segment_layout.addRow(self.segmented_checkbox)
+        self.segment_spinbox = QSpinBox()
+        self.segment_spinbox.setRange(0, 0)
+        self.segment_spinbox.valueChanged.connect(self.show_segment_info)
+        segment_layout.addRow("Segment:", self.segment_spinbox)
+        self.segment_overlay_checkbox = QCheckBox("Overlay Segments")
+        segment_layout.addRow(self.segment_overlay_checkbox)
+        self.segment_info_label = QLabel("No segments")
+        segment_layout.addRow(self.segment_info_label)
+        segment_buttons = QHBoxLayout()
+        self.clear_segments_button = QPushButton("Clear Segments")
+        self.clear_segments_button.setStyleSheet("background-color: #9E9E9E; color: white; padding: 10px;")
+        self.clear_segments_button.clicked.connect(self.clear_segments)
+        segment_buttons.addWidget(self.clear_segments_button)
+        self.save_segments_button = QPushButton("Save Segments")
+        self.save_segments_button.setStyleSheet("background-color: #388E3C; color: white; padding: 10px;")
+        self.save_segments_button.clicked.connect(self.save_segments)
+        segment_buttons.addWidget(self.save_segments_button)
+        segment_layout.addRow(segment_buttons)
+        segment_group.setLayout(segment_layout)
+        self.main_layout.addWidget(segment_group)
+
         # Channel Controls
         channel_controls_layout = QHBoxLayout()
         self.channel_checkboxes = []
@@ -400,6 +733,75 @@ class OscilloscopeApp(QMainWindow):
             channel_controls_layout.addWidget(checkbox)
         self.main_layout.addLayout(channel_controls_layout)
 
+        # FFT Analysis
+        spectrum_group = QGroupBox("Spectrum Settings")
+        spectrum_layout = QFormLayout()
+        self.fft_channel_combo = QComboBox()
+        self.fft_channel_combo.addItems([f"CH{i+1}" for i in range(4)])
+        spectrum_layout.addRow("Channel:", self.fft_channel_combo)
+        self.fft_size_combo = QComboBox()
+        self.fft_size_combo.addItems([str(size) for size in FFT_SIZES])
+        self.fft_size_combo.setCurrentText(str(self.spectrum_worker.engine.size))
+        self.fft_size_combo.currentTextChanged.connect(lambda text: self.spectrum_worker.configure(size=int(text)))
+        spectrum_layout.addRow("FFT Size:", self.fft_size_combo)
+        self.fft_window_combo = QComboBox()
+        self.fft_window_combo.addItems(WINDOWS)
+        self.fft_window_combo.currentTextChanged.connect(lambda text: self.spectrum_worker.configure(window=text))
+        spectrum_layout.addRow("Window:", self.fft_window_combo)
+        self.fft_averaging_combo = QComboBox()
+        self.fft_averaging_combo.addItems(AVERAGING_MODES)
+        self.fft_averaging_combo.currentTextChanged.connect(lambda text: self.spectrum_worker.configure(averaging=text))
+        spectrum_layout.addRow("Averaging:", self.fft_averaging_combo)
+        self.fft_average_spinbox = QSpinBox()
+        self.fft_average_spinbox.setRange(1, 256)
+        self.fft_average_spinbox.setValue(self.spectrum_worker.engine.count)
+        self.fft_average_spinbox.valueChanged.connect(lambda value: self.spectrum_worker.configure(count=value))
+        spectrum_layout.addRow("Averages:", self.fft_average_spinbox)
+        self.fft_reset_button = QPushButton("Reset Average")
+        self.fft_reset_button.setStyleSheet("background-color: #9E9E9E; color: white; padding: 10px;")
+        self.fft_reset_button.clicked.connect(self.spectrum_worker.reset)
+        spectrum_layout.addRow(self.fft_reset_button)
+        spectrum_group.setLayout(spectrum_layout)
+        self.fft_layout.addWidget(spectrum_group)
+        self.fft_plot = pg.PlotWidget()
+        self.fft_plot.setMinimumHeight(350)
+        self.fft_plot.setBackground('#000A1E')
+        self.fft_plot.setLabel('left', 'Magnitude', 'dBV')
+        self.fft_plot.setLabel('bottom', 'Frequency', 'Hz')
+        self.fft_plot.showGrid(x=True, y=True, alpha=0.3)
+        self.fft_plot.setYRange(-120, 20)
+        self.fft_trace = self.fft_plot.plot([], [], pen=pg.mkPen(color='#FFFF00', width=1))
+        self.fft_layout.addWidget(self.fft_plot)
+        self.fft_peak_label = QLabel("Peak: N/A")
+        self.fft_layout.addWidget(self.fft_peak_label)
+        self.fft_channel_combo.currentIndexChanged.connect(lambda index: self.spectrogram.configure(channel=index))
+        self.fft_window_combo.currentTextChanged.connect(lambda text: self.spectrogram.configure(window=text))
+
+        spectrogram_group = QGroupBox("Spectrogram")
+        spectrogram_layout = QFormLayout()
+        self.spectrogram_size_combo = QComboBox()
+        self.spectrogram_size_combo.addItems([str(size) for size in FFT_SIZES if size <= 4096])
+        self.spectrogram_size_combo.setCurrentText(str(self.spectrogram.size))
+        self.spectrogram_size_combo.currentTextChanged.connect(lambda text: self.spectrogram.configure(size=int(text)))
+        spectrogram_layout.addRow("Resolution:", self.spectrogram_size_combo)
+        self.spectrogram_overlap_combo = QComboBox()
+        self.spectrogram_overlap_combo.addItems(["0%", "50%", "75%", "87.5%"])
+        self.spectrogram_overlap_combo.setCurrentText(f"{self.spectrogram.overlap:.0%}")
+        self.spectrogram_overlap_combo.currentTextChanged.connect(
+            lambda text: self.spectrogram.configure(overlap=float(text.rstrip('%')) / 100))
+        spectrogram_layout.addRow("Overlap:", self.spectrogram_overlap_combo)
+        spectrogram_group.setLayout(spectrogram_layout)
+        self.fft_layout.addWidget(spectrogram_group)
+        self.spectrogram_plot = pg.PlotWidget()
+        self.spectrogram_plot.setMinimumHeight(350)
+        self.spectrogram_plot.setBackground('#000A1E')
+        self.spectrogram_plot.setLabel('left', 'Frequency', 'Hz')
+        self.spectrogram_plot.setLabel('bottom', 'Time', 's')
+        self.spectrogram_image = pg.ImageItem()
+        self.spectrogram_image.setColorMap(pg.colormap.get('viridis'))
+        self.spectrogram_plot.addItem(self.spectrogram_image)
+        self.fft_layout.addWidget(self.spectrogram_plot)
+
 
 
         control_layout.addStretch()  # Push controls to top
@@ -414,81 +816,415 @@ class OscilloscopeApp(QMainWindow):
         ports = [port.device for port in serial.tools.list_ports.comports()]
         self.com_port_selector.clear()
         self.com_port_selector.addItems(ports if ports else ["No Ports Found"])
+        self.com_port_selector.addItem(SIMULATOR_PORT)
 
     def update_plot(self):
+        # The FFT tab lives in this window, so the spectrum does not wait for the plot window
+        self.update_spectrum()
         if self.plot_window:
             time_div = self.time_div_spinbox.value()
             voltage_div = self.volt_div_spinbox.value()
-            raw_trigger_level = self.trigger_spinbox.value() / 1000
-            trigger_source = self.trigger_source_combo.currentIndex()
-            trigger_slope = self.trigger_slope_combo.currentText()
-            trigger_mode = self.trigger_mode_combo.currentText()
-
-            triggered = False
-            if self.is_running:
-                for i, buffer in enumerate(self.data_buffer):
-                    if i == trigger_source and buffer and self.channel_active[i]:
-                        last_val = buffer[-2] if len(buffer) > 1 else buffer[-1]
-                        curr_val = buffer[-1]
-                        if (trigger_slope == "Rising" and last_val < raw_trigger_level <= curr_val) or \
-                           (trigger_slope == "Falling" and last_val > raw_trigger_level >= curr_val):
-                            triggered = True
-                            break
-
-            if trigger_mode == "Normal" and not triggered:
+
+            # The trigger sits in the middle of the sweep
+            pre = self.display_window // 2
+            post = self.display_window - pre
+            oldest = self.data_buffer.total_written - len(self.data_buffer)
+            trigger_time = self.trigger_engine.sweep(pre, post, oldest)
+            if self.persistence_enabled:
+                self.update_persistence(time_div, voltage_div, trigger_time)
+                self.update_measurements()
+                return
+            if trigger_time is None:
+                if self.trigger_engine.mode != "Auto":
+                    return
+                end, phase = None, 0.0
+            else:
+                first = int(np.floor(trigger_time))
+                end, phase = first - pre + self.display_window, trigger_time - first
+
+            if self.segmented and self.segments is not None and len(self.segments):
+                self.update_segments(time_div, voltage_div)
                 return
 
             self.plot_window.update_plot(self.data_buffer, self.channel_active, time_div, voltage_div, 
                                          self.display_window, self.sample_rate, self.channel_positions, 
-                                         self.horizontal_position, self.probe_attenuation)
+                                         self.horizontal_position, self.probe_attenuation, self.pyramid,
+                                         end, phase)
+
+            self.update_measurements()
 
-            if self.data_buffer[0]:
-                freq = self.calculate_frequency(self.data_buffer[0])
-                rms = np.sqrt(np.mean(np.square(self.data_buffer[0][-self.display_window:])))
-                self.measure_freq.setText(f"Frequency: {freq:.2f} Hz")
-                self.measure_rms.setText(f"RMS Voltage: {rms:.2f} V")
+    def toggle_persistence(self, state):
+        self.persistence_enabled = bool(state)
+        self.persistence.clear()
+        # Only sweeps triggered from now on
+        self.persistence_cursor = self.trigger_engine.last_event
+        if self.plot_window:
+            if self.persistence_enabled:
+                # The map covers a fixed view; autoscaling to it would feed back
+                self.plot_window.plot_widget.disableAutoRange()
+            else:
+                self.plot_window.persistence_image.hide()
+                self.plot_window.plot_widget.enableAutoRange()
+        self.update_plot()
+
+    def update_persistence_time(self, value):
+        self.persistence.time_constant = value
+
+    def update_persistence(self, time_div, voltage_div, trigger_time):
+        window = self.display_window
+        sample_duration_ms = 1000 / self.sample_rate
+        x_start = self.horizontal_position * sample_duration_ms
+        plot_widget = self.plot_window.plot_widget
+        plot_widget.setXRange(x_start, x_start + time_div * 100, padding=0)
+        view = plot_widget.getViewBox()
+        (x0, x1), (y0, y1) = view.viewRange()
+        width, height = int(view.width()) or 640, int(view.height()) or 400
+        if (width, height) != (self.persistence.width, self.persistence.height):
+            self.persistence.resize(width, height)
+        self.persistence.set_range(x0, x1, y0, y1)
+        self.persistence.decay()
+
+        # Every sweep completed since the last tick, not just the newest one
+        pre = window // 2
+        total = self.data_buffer.total_written
+        oldest = total - len(self.data_buffer)
+        starts, phases = [], []
+        for t in self.trigger_engine.events:
+            if self.persistence_cursor is not None and t <= self.persistence_cursor:
+                continue
+            first = int(np.floor(t))
+            if first - pre + window > total:
+                break
+            self.persistence_cursor = t
+            if first - pre >= oldest:
+                starts.append(first - pre)
+                phases.append(t - first)
+        if not starts and trigger_time is None and self.trigger_engine.mode == "Auto" and total - oldest >= window:
+            starts, phases = [total - window], [0.0]
+
+        if starts:
+            starts = np.array(starts)
+            phases = np.array(phases)
+            base = int(starts.min())
+            index = (starts - base)[:, None] + np.arange(window)
+            samples = self.data_buffer.latest(total - base)
+            scale = time_div * 100 / max(window - 1, 1)
+            x = (np.arange(window)[None, :] - phases[:, None]) * scale + x_start
+            for i in range(self.data_buffer.channels):
+                if self.channel_active[i] and self.data_buffer.count(i) >= total - base:
+                    y = samples[i][index] * (voltage_div / self.probe_attenuation) + self.channel_positions[i]
+                    self.persistence.accumulate(x, y)
+        self.plot_window.show_persistence(self.persistence, self.intensity_slider.value() / 100)
+
+    def get_measurements(self):
+        """Latest WaveformMeasurements of every active channel that has data."""
+        channels = [i for i in range(self.data_buffer.channels)
+                    if self.channel_active[i] and self.data_buffer.count(i)]
+        return self.measurements.all_results(channels, self.display_window, self.sample_rate)
+
+    def analysis_slot_samples(self):
+        # Measurements take the display window, spectra at most the largest FFT
+        return 1 << (max(self.display_window, max(FFT_SIZES)) - 1).bit_length()
+
+    def offload_active(self):
+        """True while analysis runs in worker processes. A broken pool turns
+        offload off, so the caller falls back to analysing in process."""
+        if self.analysis and self.analysis.broken:
+            self.offload_check.setChecked(False)
+            self.toggle_offload(False)
+        return self.analysis is not None
+
+    def update_measurements(self):
+        if self.offload_active():
+            self.submit_measurements()
+            return
+        clock = instruments.clock()
+        results = self.get_measurements()
+        instruments.record('measure', clock)
+        self.show_measurements(results)
+
+    def submit_measurements(self):
+        channels = [i for i in range(self.data_buffer.channels)
+                    if self.channel_active[i] and self.data_buffer.count(i)]
+        key = (self.data_buffer.generation, self.data_buffer.total_written, tuple(channels), self.display_window,
+               self.sample_rate)
+        if not channels or key == self.analysis_key:
+            return
+        self.analysis_key = key
+        n = min(self.display_window, *(self.data_buffer.count(i) for i in channels))
+        self.analysis.submit('measure', [self.data_buffer.latest(n, i) for i in channels],
+                             sample_rate=self.sample_rate, channels=channels)
+
+    def show_analysis(self, kind, result, context):
+        if kind == 'measure':
+            self.show_measurements(result)
+        elif kind == 'spectrum':
+            self.spectrum_worker.submit_power(result, context)
+
+    def toggle_offload(self, state):
+        if state and not self.analysis:
+            try:
+                self.analysis = AnalysisExecutor(channels=self.data_buffer.channels,
+                                                 slot_samples=self.analysis_slot_samples(), parent=self)
+            except OSError as e:
+                log.error("Error starting analysis workers: %s", e)
+                self.offload_check.setChecked(False)
+                return
+            self.analysis.result_ready.connect(self.show_analysis)
+            self.analysis_key = None
+        elif not state and self.analysis:
+            self.analysis.shutdown()
+            self.analysis = None
+
+    def show_measurements(self, results):
+        result = results.get(self.channel_selector.currentIndex())
+        if result is None:
+            return
+        if np.isnan(result.frequency):
+            self.measure_freq.setText("Frequency: N/A")
+        else:
+            self.measure_freq.setText(f"Frequency: {result.frequency:.2f} Hz ({result.confidence:.0%})")
+        self.measure_rms.setText(f"RMS Voltage: {result.rms:.2f} V")
+        for key, label in self.measure_labels.items():
+            value = getattr(result, key)
+            if np.isnan(value):
+                label.setText("N/A")
+            elif key == 'duty_cycle':
+                label.setText(f"{100 * value:.1f} %")
+            elif key == 'overshoot':
+                label.setText(f"{value:.1f} %")
+            else:
+                label.setText(pg.siFormat(value, precision=4, suffix=self.measure_units[key]))
+
+    def update_spectrum(self):
+        # New spectrogram columns are computed even while hidden so no burst is missed
+        new_columns = self.spectrogram.update()
+        # Only pay for the FFT while its tab is on screen
+        channel = self.fft_channel_combo.currentIndex()
+        if self.tabs.currentWidget() is not self.fft_tab or not self.data_buffer.count(channel):
+            return
+        if new_columns:
+            self.show_spectrogram()
+        size = int(self.fft_size_combo.currentText())
+        if self.offload_active():
+            self.analysis.submit('spectrum', self.data_buffer.latest(size, channel), context=self.sample_rate,
+                                 size=size, window=self.fft_window_combo.currentText())
+        else:
+            self.spectrum_worker.submit(self.data_buffer.latest(size, channel), self.sample_rate)
+
+    def show_spectrogram(self):
+        spectrogram = self.spectrogram
+        duration = spectrogram.history * spectrogram.hop / self.sample_rate
+        self.spectrogram_image.setImage(spectrogram.image(), autoLevels=False, levels=(-120, 20))
+        # Time runs up to now at the right edge, frequency up to Nyquist
+        self.spectrogram_image.setRect(QRectF(-duration, 0, duration, self.sample_rate / 2))
+
+    def show_spectrum(self, freqs, db):
+        self.fft_trace.setData(freqs, db)
+        peak = int(np.argmax(db[1:])) + 1 if len(db) > 1 else 0
+        self.fft_peak_label.setText(f"Peak: {pg.siFormat(freqs[peak], precision=4, suffix='Hz')} at {db[peak]:.1f} dBV")
 
     def calculate_frequency(self, buffer):
-        if len(buffer) < 2:
-            return 0
-        crossings = 0
-        for i in range(1, min(len(buffer), self.display_window)):
-            if (buffer[i-1] < 0 and buffer[i] >= 0) or (buffer[i-1] > 0 and buffer[i] <= 0):
-                crossings += 1
-        return crossings / (self.display_window * (1000 / self.sample_rate) / 1000.0) / 2.0
+        # Crossings of the window mean, so the ADC's DC offset does not matter
+        return measure_frequency(buffer, self.sample_rate)
 
     def start_acquisition(self):
         if not self.serial_thread:
             port = self.com_port_selector.currentText()
             baudrate = self.baud_selector.value()
-            mode = self.mode_selector.currentText()
-            self.serial_thread = SerialReader(port, baudrate, channels=4, ch1_amplitude=self.ch1_amplitude, mode=mode, impedance=self.impedance)
+            mode = self.coupling_combo.currentText()
+            if port == SIMULATOR_PORT:
+                self.serial_thread = SimulatorReader(SignalGenerator(SIMULATOR_SPECS, sample_rate=100000, seed=0))
+                self.set_sample_rate(self.serial_thread.sample_rate)
+            else:
+                self.serial_thread = SerialReader(port, baudrate, channels=4, ch1_amplitude=self.ch1_amplitude, mode=mode, impedance=self.impedance)
+                self.serial_thread.trigger_received.connect(self.process_hardware_trigger)
             self.serial_thread.data_received.connect(self.process_data)
             self.serial_thread.start()
             self.is_running = True
-            if self.plot_window:
-                self.timer.start(50)
+            self.render_scheduler.start()
+
+    def open_capture(self):
+        filename, _ = QFileDialog.getOpenFileName(self, "Open Capture", "", "Capture Files (*.sdo);;All Files (*)")
+        if not filename:
+            return
+        self.stop_acquisition()
+        try:
+            reader = PlaybackReader(filename, window=self.display_window)
+        except (OSError, ValueError) as e:
+            log.error("Error opening capture: %s", e)
+            return
+        if reader.sample_rate <= 0:
+            sample_rate, ok = QInputDialog.getDouble(self, "Open Capture", "The capture does not record its "
+                                                     "sample rate.\nSample rate (Hz):", self.sample_rate, 1, 1e9, 0)
+            if not ok:
+                reader.stop()
+                return
+            reader.capture.sample_rate = sample_rate
+        self.set_sample_rate(reader.sample_rate)
+        self.data_buffer.clear()
+        self.spectrogram.configure()
+        self.serial_thread = reader
+        self.update_playback_speed(self.playback_speed_combo.currentText())
+        reader.data_received.connect(self.process_data)
+        reader.position_changed.connect(self.update_playback_position)
+        reader.finished.connect(self.render_scheduler.request)
+        self.playback_slider.setEnabled(True)
+        reader.start()
+        self.is_running = True
+        self.render_scheduler.start()
+
+    def update_playback_speed(self, text):
+        if not isinstance(self.serial_thread, PlaybackReader):
+            return
+        self.serial_thread.set_scrubbing(text == "Scrub")
+        if text != "Scrub":
+            self.serial_thread.set_speed(0 if text == "Max" else float(text.rstrip('x')))
+
+    def update_playback_position(self, position):
+        length = len(self.serial_thread.capture) if isinstance(self.serial_thread, PlaybackReader) else 0
+        if length and not self.playback_slider.isSliderDown():
+            self.playback_slider.setValue(int(1000 * position / length))
+
+    def seek_playback(self, value):
+        if isinstance(self.serial_thread, PlaybackReader):
+            self.serial_thread.seek(len(self.serial_thread.capture) * value / 1000)
 
     def stop_acquisition(self):
         if self.serial_thread:
             self.serial_thread.stop()
             self.serial_thread = None
+        self.playback_slider.setEnabled(False)
         self.is_running = False
-        self.timer.stop()
+        self.render_scheduler.stop()
         if self.plot_window:
             self.plot_window.update_plot(self.data_buffer, self.channel_active, 
                                         self.time_div_spinbox.value(), self.volt_div_spinbox.value(),
                                         self.display_window, self.sample_rate, 
-                                        self.channel_positions, self.horizontal_position)
-
-    def process_data(self, data):
-        for i in range(min(len(data), len(self.data_buffer))):
-            self.data_buffer[i].append(data[i])
-            if len(self.data_buffer[i]) > self.max_samples:
-                self.data_buffer[i].pop(0)
-        if self.is_running and self.plot_window:
-            self.update_plot()
-        print(data)
+                                        self.channel_positions, self.horizontal_position, self.probe_attenuation,
+                                        self.pyramid)
+
+    def process_data(self, block, sequence, timestamp):
+        # Binary frames carry CH1 only, ASCII chunks carry one row per channel
+        clock = instruments.clock()
+        start = self.data_buffer.total_written
+        self.data_buffer.write(block[:self.data_buffer.channels])
+        instruments.record('buffer', clock)
+        instruments.count('samples_in', block.shape[1])
+        if self.serial_thread:
+            # Blocks the reader has emitted that are still waiting in the event queue
+            instruments.gauge('backlog', getattr(self.serial_thread, 'sequence', sequence + 1) - sequence - 1)
+        hardware_index = None
+        if self.hardware_trigger is not None and self.hardware_trigger[0] == sequence:
+            if self.hardware_trigger_checkbox.isChecked() and self.hardware_trigger_usable:
+                hardware_index = self.hardware_trigger[1]
+            self.hardware_trigger = None
+        # External and channels the block does not carry can only trigger through the hardware
+        searchable = self.trigger_source < min(len(block), self.data_buffer.channels)
+        clock = instruments.clock()
+        events = self.trigger_engine.process(block[min(self.trigger_source, len(block) - 1)], start,
+                                             hardware_index, searchable)
+        instruments.record('trigger', clock)
+        if self.segmented:
+            self.capture_segments(events, timestamp)
+        if self.recorder:
+            self.recorder.submit(block)
+        if self.serial_thread:
+            self.serial_thread.release(block)
+        if self.is_running:
+            self.render_scheduler.request()
+
+    def toggle_segmented(self, state):
+        self.segmented = bool(state)
+        if self.segmented:
+            # One segment per display window, in at most 64 MiB
+            length = self.display_window
+            capacity = min(4096, SEGMENT_BUDGET // (4 * self.data_buffer.channels * length))
+            if capacity < 1:
+                log.warning("Segmented mode needs a shorter window than %d samples", length)
+                self.segmented = False
+                self.segmented_checkbox.setChecked(False)
+                return
+            if self.segments is None or self.segments.length != length or self.segments.capacity != capacity:
+                self.segments = SegmentTable(capacity, length, self.data_buffer.channels)
+            # Only events from now on
+            self.segment_pending = []
+        self.update_plot()
+
+    def capture_segments(self, events, timestamp):
+        segments = self.segments
+        pre = segments.length // 2
+        total = self.data_buffer.total_written
+        oldest = total - len(self.data_buffer)
+        pending = self.segment_pending
+        pending.extend(events.tolist())
+        # Blocks are stamped with time.monotonic(); segments keep wall-clock time
+        wall_clock = timestamp + time.time() - time.monotonic()
+        done = 0
+        for t in pending:
+            first = int(np.floor(t))
+            start = first - pre
+            if start + segments.length > total:
+                # Wait for the post-trigger samples
+                break
+            done += 1
+            if start < oldest:
+                continue
+            block = self.data_buffer.latest(total - start)[:, :segments.length]
+            segments.add(block, pre + t - first, t, wall_clock - (total - t) / self.sample_rate)
+        del pending[:done]
+
+    def update_segments(self, time_div, voltage_div):
+        segments = self.segments
+        count = len(segments)
+        self.segment_spinbox.setMaximum(count - 1)
+        if self.segment_overlay_checkbox.isChecked():
+            # Overlaying thousands of full segments is what persistence mode is for
+            indices = np.arange(max(count - 256, 0), count)
+        else:
+            indices = np.array([min(self.segment_spinbox.value(), count - 1)])
+        self.plot_window.show_segments(segments, indices, self.channel_active, time_div, voltage_div,
+                                       self.channel_positions, self.probe_attenuation)
+        self.show_segment_info()
+
+    def show_segment_info(self):
+        segments = self.segments
+        if segments is None or not len(segments):
+            self.segment_info_label.setText("No segments")
+            return
+        index = min(self.segment_spinbox.value(), len(segments) - 1)
+        timestamp, trigger_time, _ = segments.info(index)
+        clock = time.strftime('%H:%M:%S', time.localtime(timestamp)) + f"{timestamp % 1:.6f}"[1:]
+        text = f"{len(segments)} of {segments.capacity} segments, {segments.total} captured\n" \
+               f"Segment {index}: {clock}, sample {trigger_time:.1f}"
+        result = segments.measure(index, self.channel_selector.currentIndex(), self.sample_rate)
+        if result is not None:
+            text += f"\nVpp {result.vpp:.3f} V, RMS {result.rms:.3f} V"
+            if not np.isnan(result.frequency):
+                text += f", {result.frequency:.2f} Hz"
+        self.segment_info_label.setText(text)
+
+    def clear_segments(self):
+        if self.segments is not None:
+            self.segments.clear()
+        self.segment_spinbox.setRange(0, 0)
+        self.show_segment_info()
+
+    def save_segments(self):
+        if self.segments is None or not len(self.segments):
+            log.warning("No segments to save")
+            return
+        filename, _ = QFileDialog.getSaveFileName(self, "Save Segments", "", "NumPy Archives (*.npz);;All Files (*)")
+        if filename:
+            try:
+                self.segments.save(filename)
+                log.info("Saved %s segments to %s", len(self.segments), filename)
+            except OSError as e:
+                log.error("Error saving segments: %s", e)
+
+    def process_hardware_trigger(self, sequence, index):
+        # Arrives just before the block it belongs to
+        self.hardware_trigger = (sequence, index)
 
     def change_time_division(self, delta):
         new_val = self.time_div_spinbox.value() + delta
@@ -507,12 +1243,12 @@ class OscilloscopeApp(QMainWindow):
             self.update_plot()
 
     def save_data(self):
-        print("Save Snapshot button clicked")
+        log.debug("Save Snapshot button clicked")
         if not self.plot_window:
-            print("Please open the plot window first using the 'Run' button")
+            log.warning("Please open the plot window first using the 'Run' button")
             return
         filename, _ = QFileDialog.getSaveFileName(self, "Save Snapshot", "", "PNG Files (*.png);;JPG Files (*.jpg);;All Files (*)")
-        print(f"Selected filename: {filename}")
+        log.debug("Selected filename: %s", filename)
         if filename:
             try:
                 if not (filename.endswith('.png') or filename.endswith('.jpg')):
@@ -520,14 +1256,14 @@ class OscilloscopeApp(QMainWindow):
                 exporter = pg.exporters.ImageExporter(self.plot_window.plot_widget.plotItem)
                 exporter.parameters()['width'] = 900
                 exporter.export(filename)
-                print(f"Snapshot saved to {filename}")
+                log.info("Snapshot saved to %s", filename)
             except PermissionError:
-                print(f"Permission denied: Cannot write to {filename}")
+                log.error("Permission denied: Cannot write to %s", filename)
             except Exception as e:
-                print(f"Error saving snapshot: {e}")
+                log.error("Error saving snapshot: %s", e)
 
     def update_coupling(self, text):
-        print(f"Coupling set to {text} for {self.channel_selector.currentText()}")
+        log.info("Coupling set to %s for %s", text, self.channel_selector.currentText())
 
     def update_vertical_position(self, value):
         channel = self.channel_selector.currentIndex()
@@ -538,11 +1274,97 @@ class OscilloscopeApp(QMainWindow):
         self.horizontal_position = value
         self.update_plot()
 
+    def update_display_window(self, value):
+        self.display_window = value
+        if self.analysis and value > self.analysis.layout[2]:
+            # The shared memory slots are sized for the window; grow them
+            self.toggle_offload(False)
+            self.toggle_offload(True)
+        if isinstance(self.serial_thread, PlaybackReader):
+            # Scrubbing shows one window ending at the slider position
+            self.serial_thread.window = value
+        self.update_plot()
+
+    def set_sample_rate(self, sample_rate):
+        self.sample_rate = sample_rate
+        # Holdoff and pulse widths are set in milliseconds but kept in samples
+        self.configure_trigger()
+
     def update_trigger_mode(self, mode):
-        if mode == "Single" and self.is_running and self.plot_window:
-            self.timer.stop()
-        elif mode in ["Auto", "Normal"] and not self.is_running and self.plot_window:
-            self.timer.start(50)
+        # Single keeps rendering: the engine holds the captured sweep until re-armed
+        self.trigger_engine.set_mode(mode)
+
+    def configure_trigger(self):
+        self.trigger_source = self.trigger_source_combo.currentIndex()
+        samples_per_ms = self.sample_rate / 1000
+        self.trigger_engine.holdoff = self.trigger_holdoff_spinbox.value() * samples_per_ms
+        level = self.trigger_spinbox.value() / 1000
+        upper = self.trigger_upper_spinbox.value() / 1000
+        hysteresis = self.trigger_hysteresis_spinbox.value() / 1000
+        min_width = self.trigger_min_width_spinbox.value() * samples_per_ms
+        max_width = self.trigger_max_width_spinbox.value() * samples_per_ms
+        # Slope picks the pulse polarity, or for window triggers entering versus leaving
+        rising = self.trigger_slope_combo.currentText() == "Rising"
+        polarity = "Positive" if rising else "Negative"
+        trigger_type = self.trigger_type_combo.currentText()
+        # The MCU reports rising edges on its external trigger pin (PA5 EXTI) and nothing else
+        self.hardware_trigger_usable = trigger_type == "Edge" and rising and \
+            self.trigger_source_combo.currentText() == "External"
+        if trigger_type == "Pulse Width":
+            trigger = PulseWidthTrigger(level, hysteresis, polarity, self.trigger_condition_combo.currentText(),
+                                        min_width, max_width)
+        elif trigger_type == "Glitch":
+            trigger = PulseWidthTrigger(level, hysteresis, "Either", "<", max_width=max_width)
+        elif trigger_type == "Runt":
+            trigger = RuntTrigger(min(level, upper), max(level, upper), hysteresis, polarity)
+        elif trigger_type == "Window":
+            trigger = WindowTrigger(min(level, upper), max(level, upper), hysteresis, "Enter" if rising else "Exit")
+        else:
+            trigger = EdgeTrigger(level, self.trigger_slope_combo.currentText(), hysteresis)
+        self.trigger_engine.set_trigger(trigger)
+
+    def update_refresh_rate(self, fps):
+        self.refresh_rate = fps
+        self.render_scheduler.set_fps(fps)
+
+    def show_render_stats(self, stats):
+        reader = self.serial_thread
+        decoder = getattr(reader, 'decoder', None)
+        if decoder is not None:
+            instruments.gauge('frames_dropped', decoder.frames_dropped + decoder.frames_corrupt)
+            instruments.gauge('decoder_pending', decoder.pending)
+        if getattr(reader, 'block_pool', None) is not None:
+            instruments.gauge('pool_misses', reader.block_pool.misses)
+        instruments.gauge('spectrum_dropped', self.spectrum_worker.dropped)
+        instruments.gauge('recorder_queue', self.recorder.queue_depth() if self.recorder else 0)
+        if self.analysis:
+            for name, value in self.analysis.stats().items():
+                instruments.gauge(f"analysis_{name}", value)
+        instruments.gauge('render_skipped', stats['skipped'])
+        pipeline = instruments.publish()
+        if self.plot_window:
+            self.plot_window.statusBar().showMessage(
+                f"{stats['fps']:.0f}/{stats['target_fps']} FPS | "
+                f"render {stats['render_ms_avg']:.1f} ms (max {stats['render_ms_max']:.1f} ms) | "
+                f"skipped {stats['skipped']} | coalesced {stats['coalesced']}")
+            self.plot_window.show_hud(self.hud_text(stats, pipeline) if self.hud_check.isChecked() else None)
+
+    def hud_text(self, stats, pipeline):
+        gauges = pipeline['gauges']
+        lines = [
+            f"{stats['fps']:.0f} FPS   input {pipeline['rates'].get('samples_in', 0) / 1e3:.1f} kS/s",
+            f"backlog {gauges.get('backlog', 0)}   dropped {gauges.get('frames_dropped', 0)}",
+        ]
+        for name, stage in pipeline['stages'].items():
+            lines.append(f"{name:8s}{stage['mean_ms']:8.3f} ms  p99 {stage['p99_ms']:.3f}")
+        bottleneck = instruments.bottleneck(pipeline)
+        if bottleneck:
+            lines.append(f"slowest: {bottleneck}")
+        return "\n".join(lines)
+
+    def toggle_hud(self, state):
+        if self.plot_window and not state:
+            self.plot_window.show_hud(None)
 
     def run_plot(self):
         if not self.plot_window:
@@ -551,11 +1373,12 @@ class OscilloscopeApp(QMainWindow):
             self.update_plot()
 
     def auto_set(self):
-        print("Auto Set triggered")
+        log.info("Auto Set triggered")
 
     def default_setup(self):
         self.time_div_spinbox.setValue(1)
         self.volt_div_spinbox.setValue(1)
+        self.trigger_type_combo.setCurrentText("Edge")
         self.trigger_spinbox.setValue(2500)
         self.trigger_mode_combo.setCurrentText("Auto")
         self.trigger_source_combo.setCurrentText("CH1")
@@ -579,42 +1402,43 @@ class OscilloscopeApp(QMainWindow):
         self.update_plot()
 
     def record_data(self):
-        print("Record Waveform button clicked")
-        filename, _ = QFileDialog.getSaveFileName(self, "Save Waveform Data", "", "CSV Files (*.csv);;All Files (*)")
-        print(f"Selected filename: {filename}")
+        if self.recorder:
+            self.stop_recording()
+            return
+        log.debug("Record Waveform button clicked")
+        filename, _ = QFileDialog.getSaveFileName(self, "Record Waveform", "", "Capture Files (*.sdo);;All Files (*)")
+        log.debug("Selected filename: %s", filename)
         if filename:
-            if not filename.endswith('.csv'):
-                filename += '.csv'
+            if not filename.endswith('.sdo'):
+                filename += '.sdo'
             try:
-                # Prepare data for CSV
-                max_length = max(len(buffer) for buffer in self.data_buffer if buffer)
-                if max_length == 0:
-                    print("No data to save - all channels are empty")
-                    with open(filename, 'w') as file:
-                        file.write("No data available\n")
-                    return
-
-                # Create a dictionary to hold the data for each active channel
-                data_dict = {}
-                for i, buffer in enumerate(self.data_buffer):
-                    if self.channel_active[i]:
-                        data_dict[f"Channel {i+1}"] = buffer + [0.0] * (max_length - len(buffer)) if buffer else [0.0] * max_length
-
-                # If no active channels have data, write a message
-                if not data_dict:
-                    print("No active channels have data to save")
-                    with open(filename, 'w') as file:
-                        file.write("No active channels have data\n")
-                    return
-
-                # Convert to DataFrame and save to CSV
-                df = pd.DataFrame(data_dict)
-                df.to_csv(filename, index_label="Sample")
-                print(f"Waveform data saved to {filename}")
+                source = self.serial_thread
+                # Serial sources do not know their sample rate; record it as unknown
+                sample_rate = getattr(source, 'sample_rate', 0)
+                if isinstance(source, SerialReader) and source.protocol == 'binary':
+                    # Store the 12-bit ADC codes rather than float32 volts
+                    self.recorder = WaveformRecorder(filename, sample_rate, dtype=np.uint16,
+                                                     scale=source.volts_per_count())
+                else:
+                    self.recorder = WaveformRecorder(filename, sample_rate)
+                self.recorder.start()
+                self.record_button.setText("Stop Recording")
+                log.info("Recording waveform data to %s", filename)
             except PermissionError:
-                print(f"Permission denied: Cannot write to {filename}")
+                log.error("Permission denied: Cannot write to %s", filename)
+                self.recorder = None
             except Exception as e:
-                print(f"Error saving waveform data: {e}")
+                log.error("Error starting waveform recording: %s", e)
+                self.recorder = None
+
+    def stop_recording(self):
+        recorder = self.recorder
+        self.recorder = None
+        recorder.stop()
+        self.record_button.setText("Record Waveform")
+        stats = recorder.stats()
+        log.info("Waveform recording saved to %s: %d samples, %d blocks dropped, max queue depth %d",
+                 recorder.filename, stats['samples_written'], stats['dropped_blocks'], stats['max_queue_depth'])
 
     def toggle_grid(self, state):
         if self.plot_window:
@@ -645,12 +1469,25 @@ class OscilloscopeApp(QMainWindow):
 
     def update_data(self):
         # Apply probe attenuation to the data buffer
-        for i in range(len(self.data_buffer)):
+        for i in range(self.data_buffer.channels):
             if self.channel_active[i]:
-                self.data_buffer[i] = [value / self.probe_attenuation for value in self.data_buffer[i]]
+                self.data_buffer.scale(i, 1 / self.probe_attenuation)
+
+    def closeEvent(self, event):
+        self.stop_acquisition()
+        if self.recorder:
+            self.stop_recording()
+        self.spectrum_worker.stop()
+        if self.analysis:
+            self.analysis.shutdown()
+            self.analysis = None
+        super().closeEvent(event)
 
 
 if __name__ == '__main__':
+    # SDO_LOG_LEVEL=DEBUG also logs the pipeline statistics once a second
+    logging.basicConfig(level=os.environ.get('SDO_LOG_LEVEL', 'INFO').upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     app = QApplication(sys.argv)
     window = OscilloscopeApp()
     window.show()
@@ -0,0 +1,300 @@
+from collections import namedtuple
+
+import numpy as np
+
+FrequencyResult = namedtuple('FrequencyResult', ['frequency', 'period', 'confidence', 'method'])
+
+NO_FREQUENCY = FrequencyResult(0.0, 0.0, 0.0, 'none')
+
+# Lowest FFT bin trusted as a frequency; below it the Hann main lobe of
+# the window itself holds most of the energy
+FFT_MIN_BIN = 3
+
+
+def schmitt_states(samples, low, high):
+    """Comparator output with hysteresis: 1 above high, 0 below low, and
+    the previous state in between (-1 until the first decision)."""
+    decided = (samples > high) | (samples < low)
+    index = np.where(decided, np.arange(len(samples)), -1)
+    np.maximum.accumulate(index, out=index)
+    states = np.where(index >= 0, samples[index] > high, False).astype(np.int8)
+    states[index < 0] = -1
+    return states
+
+
+def rising_crossings(samples, level, hysteresis, states=None):
+    """Sub-sample times of rising crossings of level.
+
+    An edge only counts once the signal has gone below level - hysteresis
+    and then above level + hysteresis, so noise around the level does not
+    produce extra edges. The reported time is the last crossing of level
+    itself before the upper threshold was reached, linearly interpolated
+    between the two samples around it. states may be passed in when the
+    caller has already run schmitt_states with the same thresholds.
+    """
+    if states is None:
+        states = schmitt_states(samples, level - hysteresis, level + hysteresis)
+    edges = np.flatnonzero((states[1:] == 1) & (states[:-1] == 0)) + 1
+    if len(edges) == 0:
+        return np.empty(0)
+    above = samples > level
+    raw = np.flatnonzero(above[1:] & ~above[:-1]) + 1
+    # Last raw level crossing at or before each confirmed edge
+    idx = raw[np.searchsorted(raw, edges, side='right') - 1]
+    before = samples[idx - 1].astype(np.float64)
+    after = samples[idx].astype(np.float64)
+    return idx - 1 + (level - before) / (after - before)
+
+
+def frequency_zero_crossing(samples, sample_rate, level=None, hysteresis=None, states=None):
+    if len(samples) < 3:
+        return NO_FREQUENCY
+    lo, hi = float(samples.min()), float(samples.max())
+    if hi <= lo:
+        return NO_FREQUENCY
+    if level is None:
+        level = float(samples.mean())
+    if hysteresis is None:
+        hysteresis = 0.1 * (hi - lo)
+    times = rising_crossings(samples, level, hysteresis, states)
+    if len(times) < 2:
+        return NO_FREQUENCY
+    periods = np.diff(times)
+    median = float(np.median(periods))
+    # Count whole cycles against the median period so an occasional noise
+    # edge that slipped through the hysteresis does not shorten the period
+    regular = np.abs(periods - median) <= 0.2 * median
+    span = times[-1] - times[0]
+    cycles = max(1, int(round(span / periods[regular].mean())))
+    period = span / cycles
+    jitter = periods[regular].std() / period if regular.sum() > 1 else 0.5
+    confidence = float(regular.mean() * max(0.0, 1.0 - jitter) * (1.0 - 1.0 / (cycles + 1)))
+    return FrequencyResult(float(sample_rate / period), float(period / sample_rate), confidence, 'zero_crossing')
+
+
+def _no_ac(samples, x):
+    # What is left of a DC window after removing the mean is rounding error
+    eps = np.finfo(samples.dtype).eps if samples.dtype.kind == 'f' else np.finfo(np.float64).eps
+    return np.abs(x).max() <= 16 * eps * max(float(np.abs(samples).max()), np.finfo(np.float64).tiny)
+
+
+def frequency_autocorrelation(samples, sample_rate):
+    n = len(samples)
+    if n < 4:
+        return NO_FREQUENCY
+    x = samples.astype(np.float64) - samples.mean()
+    if _no_ac(samples, x):
+        return NO_FREQUENCY
+    size = 1 << (2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(x, size)
+    acf = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, size)[:n // 2]
+    if acf[0] <= 0:
+        return NO_FREQUENCY
+    acf /= acf[0]
+    # The fundamental period is the highest point of the first positive
+    # lobe after the correlation has dipped below zero
+    negative = np.flatnonzero(acf < 0)
+    if len(negative) == 0:
+        return NO_FREQUENCY
+    positive = np.flatnonzero(acf[negative[0]:] >= 0)
+    if len(positive) == 0:
+        return NO_FREQUENCY
+    lobe_start = negative[0] + positive[0]
+    lobe_end = np.flatnonzero(acf[lobe_start:] < 0)
+    lobe_end = lobe_start + lobe_end[0] if len(lobe_end) else len(acf)
+    peak = lobe_start + int(np.argmax(acf[lobe_start:lobe_end]))
+    if peak + 1 >= len(acf):
+        return NO_FREQUENCY
+    # Parabolic interpolation of the peak lag
+    a, b, c = acf[peak - 1], acf[peak], acf[peak + 1]
+    denom = a - 2 * b + c
+    lag = peak + (0.5 * (a - c) / denom if denom else 0.0)
+    confidence = float(np.clip(b, 0.0, 1.0))
+    return FrequencyResult(float(sample_rate / lag), float(lag / sample_rate), confidence, 'autocorrelation')
+
+
+def frequency_fft(samples, sample_rate):
+    n = len(samples)
+    if n < 4:
+        return NO_FREQUENCY
+    x = samples.astype(np.float64) - samples.mean()
+    if _no_ac(samples, x):
+        return NO_FREQUENCY
+    power = np.abs(np.fft.rfft(x * np.hanning(n))) ** 2
+    power[0] = 0
+    total = power.sum()
+    if total <= 0:
+        return NO_FREQUENCY
+    peak = int(np.argmax(power[1:-1])) + 1
+    if peak < FFT_MIN_BIN:
+        # Fewer than about two cycles in the window: the peak is the window
+        # shape (a slope or a partial cycle), not a frequency
+        return NO_FREQUENCY
+    a, b, c = np.log(power[peak - 1:peak + 2] + 1e-30)
+    denom = a - 2 * b + c
+    bin_ = peak + (0.5 * (a - c) / denom if denom else 0.0)
+    frequency = float(bin_ * sample_rate / n)
+    # Share of the energy in the main lobe of the peak
+    confidence = float(power[max(peak - 2, 0):peak + 3].sum() / total)
+    return FrequencyResult(frequency, 1 / frequency if frequency else 0.0, confidence, 'fft')
+
+
+def measure_frequency(samples, sample_rate, method='auto', level=None, hysteresis=None, min_confidence=0.5):
+    """Frequency of a NumPy window, with a confidence in [0, 1].
+
+    'auto' uses hysteresis zero crossings at the mean level (or the given
+    level) and falls back to autocorrelation, then to the FFT peak, when
+    that is not confident enough.
+    """
+    samples = np.asarray(samples)
+    if method == 'zero_crossing':
+        return frequency_zero_crossing(samples, sample_rate, level, hysteresis)
+    if method == 'autocorrelation':
+        return frequency_autocorrelation(samples, sample_rate)
+    if method == 'fft':
+        return frequency_fft(samples, sample_rate)
+
+    best = frequency_zero_crossing(samples, sample_rate, level, hysteresis)
+    if best.confidence >= min_confidence:
+        return best
+    for estimate in (frequency_autocorrelation, frequency_fft):
+        result = estimate(samples, sample_rate)
+        if result.confidence > best.confidence:
+            best = result
+        if best.confidence >= min_confidence:
+            break
+    return best
+
+
+WaveformMeasurements = namedtuple('WaveformMeasurements', [
+    'vpp', 'vmax', 'vmin', 'mean', 'rms', 'ac_rms', 'top', 'base',
+    'frequency', 'period', 'confidence', 'duty_cycle',
+    'rise_time', 'fall_time', 'overshoot', 'pulse_width',
+])
+
+
+def _raw_rising(samples, level):
+    above = samples > level
+    return np.flatnonzero(above[1:] & ~above[:-1]) + 1
+
+
+def _interpolate(samples, idx, level):
+    before = samples[idx - 1].astype(np.float64)
+    after = samples[idx].astype(np.float64)
+    return idx - 1 + (level - before) / (after - before)
+
+
+def _transition_times(samples, edges, low, high):
+    """Median low-to-high transition time (in samples) around rising edges."""
+    raw_low = _raw_rising(samples, low)
+    raw_high = _raw_rising(samples, high)
+    if len(raw_low) == 0 or len(raw_high) == 0:
+        return np.nan
+    i_low = np.searchsorted(raw_low, edges, side='right') - 1
+    i_high = np.searchsorted(raw_high, edges, side='left')
+    ok = (i_low >= 0) & (i_high < len(raw_high))
+    if not ok.any():
+        return np.nan
+    t_low = _interpolate(samples, raw_low[i_low[ok]], low)
+    t_high = _interpolate(samples, raw_high[i_high[ok]], high)
+    return float(np.median(t_high - t_low))
+
+
+def measure_waveform(samples, sample_rate):
+    """Amplitude and timing measurements of one window, sharing one set of
+    edge detections between all of them.
+
+    Timing values are in seconds, duty cycle is a fraction and overshoot is
+    a percentage of the top-to-base amplitude; anything that needs edges is
+    NaN when the window does not contain them.
+    """
+    samples = np.asarray(samples)
+    n = len(samples)
+    if n == 0:
+        return None
+    x = samples.astype(np.float64, copy=False)
+    vmin = float(x.min())
+    vmax = float(x.max())
+    mean = float(x.mean())
+    mean_square = float(np.dot(x, x) / n)
+    rms = np.sqrt(mean_square)
+    ac_rms = np.sqrt(max(mean_square - mean * mean, 0.0))
+    vpp = vmax - vmin
+
+    nan = float('nan')
+    top, base = vmax, vmin
+    frequency = period = duty_cycle = rise_time = fall_time = overshoot = pulse_width = nan
+    confidence = 0.0
+    if vpp > 0 and n >= 3:
+        mid = (vmax + vmin) / 2
+        hysteresis = 0.1 * vpp
+        states = schmitt_states(x, mid - hysteresis, mid + hysteresis)
+        high = states == 1
+        low = states == 0
+        # Settled levels, robust against overshoot and ringing
+        if high.any() and low.any():
+            top = float(np.median(x[high]))
+            base = float(np.median(x[low]))
+        amplitude = top - base
+        if amplitude > 0:
+            overshoot = 100.0 * max(vmax - top, 0.0) / amplitude
+
+        rises = np.flatnonzero((states[1:] == 1) & (states[:-1] == 0)) + 1
+        falls = np.flatnonzero((states[1:] == 0) & (states[:-1] == 1)) + 1
+
+        result = frequency_zero_crossing(x, sample_rate, mid, hysteresis, states)
+        if result.confidence < 0.5:
+            result = max(result, measure_frequency(x, sample_rate), key=lambda r: r.confidence)
+        if result.frequency > 0:
+            frequency, period, confidence = result.frequency, result.period, result.confidence
+
+        if len(rises) and len(falls) and amplitude > 0:
+            # Positive pulse: each rising edge up to the next falling edge
+            rise_times = _raw_rising(x, mid)
+            t_rise = _interpolate(x, rise_times[np.searchsorted(rise_times, rises, side='right') - 1], mid)
+            fall_idx = _raw_rising(-x, -mid)
+            t_fall = _interpolate(-x, fall_idx[np.searchsorted(fall_idx, falls, side='right') - 1], -mid)
+            following = np.searchsorted(t_fall, t_rise)
+            paired = following < len(t_fall)
+            if paired.any():
+                pulse_width = float(np.mean(t_fall[following[paired]] - t_rise[paired])) / sample_rate
+                if period > 0:
+                    duty_cycle = pulse_width / period
+
+            ten = base + 0.1 * amplitude
+            ninety = base + 0.9 * amplitude
+            rise_time = _transition_times(x, rises, ten, ninety) / sample_rate
+            fall_time = _transition_times(-x, falls, -ninety, -ten) / sample_rate
+
+    return WaveformMeasurements(vpp, vmax, vmin, mean, rms, ac_rms, top, base,
+                                frequency, period, confidence, duty_cycle,
+                                rise_time, fall_time, overshoot, pulse_width)
+
+
+class MeasurementEngine:
+    """Per-channel measurement cache over a RingBuffer.
+
+    results() recomputes a channel only when new samples have been written
+    or the window or sample rate changed since the last call, so redraws
+    without new data cost nothing.
+    """
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.cache = {}
+
+    def invalidate(self):
+        self.cache.clear()
+
+    def results(self, channel, window, sample_rate):
+        key = (self.ring.generation, self.ring.total_written, self.ring.count(channel), window, sample_rate)
+        cached = self.cache.get(channel)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        samples = self.ring.latest(window, channel)
+        result = measure_waveform(samples, sample_rate) if len(samples) else None
+        self.cache[channel] = (key, result)
+        return result
+
+    def all_results(self, channels, window, sample_rate):
+        return {channel: self.results(channel, window, sample_rate) for channel in channels}
@@ -0,0 +1,107 @@
+import time
+
+import numpy as np
+
+
+class PersistenceMap:
+    """Digital-phosphor hit-count histogram of many sweeps.
+
+    Every sweep is rasterized as connected line segments onto a
+    (width, height) pixel grid covering the given plot range, and each pixel
+    it passes through gets one hit. decay() dims the whole map by
+    exp(-elapsed / time_constant), so frequent paths stay bright and rare
+    ones fade.
+    """
+
+    def __init__(self, width=640, height=400, time_constant=1.0):
+        self.time_constant = time_constant
+        self.range = None
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        self.width = max(int(width), 2)
+        self.height = max(int(height), 2)
+        self.hits = np.zeros((self.width, self.height), dtype=np.float32)
+        self.last_decay = time.monotonic()
+        self.sweeps = 0
+
+    def clear(self):
+        self.hits[:] = 0
+        self.sweeps = 0
+
+    def set_range(self, x0, x1, y0, y1):
+        """Plot coordinates covered by the map; a change clears it."""
+        new_range = (float(x0), float(x1), float(y0), float(y1))
+        if new_range != self.range:
+            self.range = new_range
+            self.clear()
+
+    def decay(self, now=None):
+        now = time.monotonic() if now is None else now
+        elapsed = now - self.last_decay
+        self.last_decay = now
+        if self.time_constant > 0:
+            self.hits *= np.float32(np.exp(-elapsed / self.time_constant))
+        else:
+            self.hits[:] = 0
+
+    def accumulate(self, x, y):
+        """Adds sweeps given as (m, n) or (n,) arrays of plot coordinates;
+        x must increase along each sweep."""
+        x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+        y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+        x = np.broadcast_to(x, y.shape)
+        m, n = y.shape
+        if n < 2 or self.range is None:
+            return
+        x0, x1, y0, y1 = self.range
+        width, height = self.width, self.height
+        px = np.clip((x - x0) * ((width - 1) / (x1 - x0)), -1, width)
+        py = (y - y0) * ((height - 1) / (y1 - y0))
+
+        # Where each sweep crosses the border between two pixel columns, so
+        # the line is continuous from column to column. All sweeps are
+        # searched at once by giving each row its own stretch of x.
+        stride = width + 2
+        rows = np.arange(m)[:, None] * stride
+        flat_x = (px + rows).ravel()
+        borders = (np.arange(width - 1) + 0.5 + rows).ravel()
+        after = np.searchsorted(flat_x, borders)
+        inside = (after % n != 0) & (after < m * n) & (after // n == np.repeat(np.arange(m), width - 1))
+        after = after[inside]
+        xa, xb = flat_x[after - 1], flat_x[after]
+        ya, yb = py.ravel()[after - 1], py.ravel()[after]
+        border_y = ya + (borders[inside] - xa) * (yb - ya) / (xb - xa)
+        border_column = np.tile(np.arange(width - 1), m)[inside]
+        border_row = np.repeat(np.arange(m), width - 1)[inside]
+
+        # Lowest and highest pixel of the line in every column of every
+        # sweep, from its samples and the border crossings on both sides
+        columns = np.rint(px).astype(np.intp).ravel()
+        ids = np.concatenate((np.repeat(np.arange(m), n) * width + columns,
+                              border_row * width + border_column,
+                              border_row * width + border_column + 1))
+        values = np.concatenate((py.ravel(), border_y, border_y))
+        keep = (ids >= 0) & (ids < m * width) & (np.concatenate((columns, border_column, border_column + 1)) >= 0) & \
+               (np.concatenate((columns, border_column, border_column + 1)) < width)
+        ids, values = ids[keep], values[keep]
+        lo = np.full(m * width, np.inf)
+        hi = np.full(m * width, -np.inf)
+        np.minimum.at(lo, ids, values)
+        np.maximum.at(hi, ids, values)
+
+        # Every pixel of each column span gets one hit
+        visible = (hi >= -0.5) & (lo <= height - 0.5)
+        column = np.flatnonzero(visible) % width
+        bottom = np.clip(np.rint(lo[visible]), 0, height - 1).astype(np.intp)
+        top = np.clip(np.rint(hi[visible]), 0, height - 1).astype(np.intp)
+        lengths = top - bottom + 1
+        first = column * height + bottom
+        pixels = np.arange(lengths.sum()) + np.repeat(first - (np.cumsum(lengths) - lengths), lengths)
+        np.add.at(self.hits.reshape(-1), pixels, np.ones(len(pixels), dtype=np.float32))
+        self.sweeps += m
+
+    def image(self):
+        """Log-compressed intensities, so single hits remain visible next to
+        paths that are hit by every sweep."""
+        return np.log1p(self.hits)
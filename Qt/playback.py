@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from bufferpool import InFlightLimit
+from recorder import read_header, CAPTURE_HEADER_SIZE
+
+log = logging.getLogger('sdo.playback')
+
+
+class CaptureFile:
+    """Read-only, memory-mapped view of a capture written by WaveformRecorder.
+
+    Nothing is loaded up front; window() returns (channels, n) views of the
+    mapping, so multi-gigabyte captures cost only the pages that are
+    actually looked at.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            header = read_header(f)
+        self.channels = header['channels']
+        self.dtype = header['dtype']
+        self.sample_rate = header['sample_rate']
+        self.start_time = header['start_time']
+        self.scale = header['scale']
+        row_size = self.dtype.itemsize * max(self.channels, 1)
+        self.length = (os.path.getsize(filename) - CAPTURE_HEADER_SIZE) // row_size
+        if self.length and self.channels:
+            self.samples = np.memmap(filename, dtype=self.dtype, mode='r', offset=CAPTURE_HEADER_SIZE,
+                                     shape=(self.length, self.channels))
+        else:
+            self.samples = np.zeros((0, max(self.channels, 1)), dtype=self.dtype)
+
+    def __len__(self):
+        return self.length
+
+    def duration(self):
+        return self.length / self.sample_rate if self.sample_rate else 0.0
+
+    def window(self, start, count):
+        """(channels, n) samples in volts; a view of the mapping when the
+        capture holds float32 volts, a converted copy otherwise."""
+        start = min(max(int(start), 0), self.length)
+        samples = self.samples[start:start + int(count)].T
+        if self.dtype == np.float32 and self.scale == 1.0:
+            return samples
+        return samples * np.float32(self.scale)
+
+    def close(self):
+        # Windows still queued for the GUI keep the mapping alive until
+        # they are garbage collected, so it is never unmapped explicitly
+        self.samples = None
+
+
+class PlaybackReader(QThread):
+    """Acquisition source that replays a capture file.
+
+    Emits the same (block, sequence, timestamp) signal as SerialReader so the
+    rest of the pipeline cannot tell the difference. speed scales the
+    original sample rate (0 plays as fast as the consumer allows, with at
+    most max_in_flight blocks waiting to be released). In scrub
+    mode the position only moves on seek(), and each seek emits one window.
+    """
+    data_received = pyqtSignal(object, int, float)
+    position_changed = pyqtSignal(int)
+
+    def __init__(self, filename, block_size=256, speed=1.0, window=500, max_in_flight=32):
+        super().__init__()
+        self.capture = CaptureFile(filename)
+        self.block_size = block_size
+        self.speed = speed
+        self.window = window
+        self.position = 0
+        self.sequence = 0
+        self.scrubbing = False
+        self.running = False
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.in_flight = InFlightLimit(max_in_flight)
+
+    @property
+    def sample_rate(self):
+        return self.capture.sample_rate
+
+    def start(self, *args):
+        # Set before the thread exists, so a stop() right after start() is not lost
+        self.running = True
+        super().start(*args)
+
+    def run(self):
+        log.info("Playing back %s", self.capture.filename)
+        start_time = None
+        while self.running:
+            if start_time is None or self.wake.is_set():
+                # Speed, position or mode changed: restart the pacing clock here
+                self.wake.clear()
+                start_time = time.monotonic()
+                start_position = self.position
+            if self.scrubbing:
+                self.wake.wait(0.1)
+                continue
+            if not self.in_flight.wait(0.1):
+                continue
+
+            with self.lock:
+                position = self.position
+                if position >= len(self.capture):
+                    break
+                block = self.capture.window(position, self.block_size)
+                self.position = position + block.shape[1]
+            self.emit_block(block)
+            self.position_changed.emit(self.position)
+
+            if self.speed > 0 and self.capture.sample_rate > 0:
+                # Sleep until the wall clock catches up with the replayed samples
+                due = start_time + (self.position - start_position) / (self.capture.sample_rate * self.speed)
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self.wake.wait(delay)
+                elif delay < -1.0:
+                    # Consumer fell behind; resynchronize instead of bursting
+                    self.wake.set()
+        self.running = False
+
+    def emit_block(self, block):
+        self.in_flight.sent()
+        self.data_received.emit(block, self.sequence, time.monotonic())
+        self.sequence += 1
+
+    def set_speed(self, speed):
+        self.speed = speed
+        self.wake.set()
+
+    def set_scrubbing(self, scrubbing):
+        self.scrubbing = scrubbing
+        self.wake.set()
+
+    def seek(self, position):
+        block = None
+        with self.lock:
+            self.position = min(max(int(position), 0), len(self.capture))
+            if self.scrubbing:
+                # Show the window that ends at the scrub position
+                start = max(self.position - self.window, 0)
+                block = self.capture.window(start, self.position - start)
+        if block is not None and block.shape[1]:
+            self.emit_block(block)
+        self.wake.set()
+
+    def release(self, block):
+        self.in_flight.release()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        self.quit()
+        self.wait()
+        self.capture.close()
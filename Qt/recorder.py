@@ -0,0 +1,163 @@
+import logging
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+log = logging.getLogger('sdo.recorder')
+
+# Capture file layout: a fixed 64-byte little-endian header followed by
+# sample-interleaved data, i.e. an (n_samples, channels) array in C order.
+# The sample count is implied by the file size, so a capture cut short by a
+# crash is still readable up to the last complete sample. Samples are
+# stored in units of scale volts (raw ADC codes, or float32 volts with
+# scale 1). A sample_rate of 0 means the rate was not known when recording.
+# Version 1 headers have no scale field and always hold volts.
+CAPTURE_MAGIC = b'SDOCAP01'
+CAPTURE_VERSION = 2
+CAPTURE_HEADER = struct.Struct('<8sHH4sddd')
+CAPTURE_HEADER_V1 = struct.Struct('<8sHH4sdd')
+CAPTURE_HEADER_SIZE = 64
+
+
+def write_header(file, channels, sample_rate, dtype=np.float32, start_time=None, scale=1.0):
+    dtype = np.dtype(dtype).newbyteorder('<')
+    header = CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, channels, dtype.str.encode().ljust(4),
+                                 sample_rate, time.time() if start_time is None else start_time, scale)
+    file.write(header.ljust(CAPTURE_HEADER_SIZE, b'\0'))
+
+
+def read_header(file):
+    raw = file.read(CAPTURE_HEADER_SIZE)
+    if len(raw) < CAPTURE_HEADER_SIZE:
+        raise ValueError("File is too short to be a capture")
+    magic, version = CAPTURE_HEADER.unpack_from(raw)[:2]
+    if magic != CAPTURE_MAGIC:
+        raise ValueError("Not a waveform capture file")
+    if version == 1:
+        _, _, channels, dtype, sample_rate, start_time = CAPTURE_HEADER_V1.unpack_from(raw)
+        scale = 1.0
+    else:
+        _, _, channels, dtype, sample_rate, start_time, scale = CAPTURE_HEADER.unpack_from(raw)
+    return {
+        'version': version,
+        'channels': channels,
+        'dtype': np.dtype(dtype.rstrip(b'\0 ').decode()),
+        'sample_rate': sample_rate,
+        'start_time': start_time,
+        'scale': scale,
+    }
+
+
+class WaveformRecorder:
+    """Streams every acquired block to a capture file from a writer thread.
+
+    submit() is called from the GUI thread and never blocks: it copies the
+    block into the queue, or counts it as dropped when the writer has
+    fallen queue_size blocks behind. The channel count is fixed by the
+    first block; later blocks are cropped or zero-padded to match.
+
+    With an integer dtype the volts are stored as round(volts / scale),
+    clipped to the dtype's range; recording the ADC codes of a serial
+    source this way with scale the volts per count is lossless and half
+    the size of float32. sample_rate 0 records the rate as unknown.
+    """
+
+    def __init__(self, filename, sample_rate, dtype=np.float32, queue_size=256, scale=1.0):
+        self.filename = filename
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.scale = scale
+        self.channels = None
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.file = None
+        self.error = None
+        self.blocks_written = 0
+        self.samples_written = 0
+        self.bytes_written = 0
+        self.dropped_blocks = 0
+        self.dropped_samples = 0
+        self.max_queue_depth = 0
+
+    def start(self):
+        self.file = open(self.filename, 'wb')
+        self.thread = threading.Thread(target=self._writer, name="WaveformRecorder", daemon=True)
+        self.thread.start()
+
+    def is_recording(self):
+        return self.thread is not None and self.error is None
+
+    def submit(self, block):
+        if not self.is_recording():
+            return False
+        if self.channels is None:
+            self.channels = block.shape[0]
+        rows = np.zeros((block.shape[1], self.channels), dtype=self.dtype)
+        width = min(self.channels, block.shape[0])
+        if self.dtype.kind in 'iu':
+            info = np.iinfo(self.dtype)
+            rows[:, :width] = np.clip(np.rint(block[:width].T / self.scale), info.min, info.max)
+        else:
+            rows[:, :width] = block[:width].T
+        try:
+            self.queue.put_nowait(rows)
+        except queue.Full:
+            self.dropped_blocks += 1
+            self.dropped_samples += block.shape[1]
+            return False
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return True
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        self.file.close()
+
+    def stats(self):
+        return {
+            'blocks_written': self.blocks_written,
+            'samples_written': self.samples_written,
+            'bytes_written': self.bytes_written,
+            'dropped_blocks': self.dropped_blocks,
+            'dropped_samples': self.dropped_samples,
+            'queue_depth': self.queue_depth(),
+            'max_queue_depth': self.max_queue_depth,
+        }
+
+    def _writer(self):
+        header_written = False
+        while True:
+            rows = self.queue.get()
+            if rows is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                if not header_written:
+                    write_header(self.file, rows.shape[1], self.sample_rate, self.dtype, scale=self.scale)
+                    self.bytes_written += CAPTURE_HEADER_SIZE
+                    header_written = True
+                self.file.write(rows)
+            except OSError as e:
+                self.error = e
+                log.error("Error writing waveform data: %s", e)
+                continue
+            self.blocks_written += 1
+            self.samples_written += len(rows)
+            self.bytes_written += rows.nbytes
+        try:
+            if not header_written:
+                write_header(self.file, self.channels or 0, self.sample_rate, self.dtype, scale=self.scale)
+                self.bytes_written += CAPTURE_HEADER_SIZE
+            self.file.flush()
+        except OSError as e:
+            self.error = e
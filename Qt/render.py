@@ -0,0 +1,92 @@
+import time
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal, Qt
+
+from instrument import instruments
+
+
+class RenderScheduler(QObject):
+    """Redraws at a fixed refresh rate instead of once per incoming sample.
+
+    Producers call request() as often as they like; requests only mark the
+    display dirty, and the timer renders the latest state at most once per
+    tick. Render timing and skipped frames are published once a second
+    through stats_updated.
+    """
+    stats_updated = pyqtSignal(dict)
+
+    def __init__(self, render, fps=30, parent=None):
+        super().__init__(parent)
+        self.render = render
+        self.dirty = False
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self._tick)
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self._publish_stats)
+        self.set_fps(fps)
+        self.reset_stats()
+
+    def set_fps(self, fps):
+        self.fps = max(1, int(fps))
+        self.interval = 1.0 / self.fps
+        self.timer.setInterval(round(1000 / self.fps))
+
+    def start(self):
+        self.last_tick = time.perf_counter()
+        self.timer.start()
+        self.stats_timer.start(1000)
+
+    def stop(self):
+        self.timer.stop()
+        self.stats_timer.stop()
+
+    def is_active(self):
+        return self.timer.isActive()
+
+    def request(self):
+        if self.dirty:
+            self.coalesced += 1
+        self.dirty = True
+
+    def reset_stats(self):
+        self.frames = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.render_time_total = 0.0
+        self.render_time_max = 0.0
+        self.window_start = time.perf_counter()
+        self.last_tick = self.window_start
+
+    def _tick(self):
+        now = time.perf_counter()
+        # Ticks that the event loop could not deliver on time are skipped frames
+        late = int((now - self.last_tick) / self.interval) - 1
+        if late > 0:
+            self.skipped += late
+        self.last_tick = now
+        if not self.dirty:
+            return
+        self.dirty = False
+        self.render()
+        elapsed = time.perf_counter() - now
+        self.frames += 1
+        self.render_time_total += elapsed
+        self.render_time_max = max(self.render_time_max, elapsed)
+        instruments.add('render', elapsed)
+
+    def stats(self):
+        span = max(time.perf_counter() - self.window_start, 1e-9)
+        return {
+            'fps': self.frames / span,
+            'target_fps': self.fps,
+            'frames': self.frames,
+            'coalesced': self.coalesced,
+            'skipped': self.skipped,
+            'render_ms_avg': 1000 * self.render_time_total / self.frames if self.frames else 0.0,
+            'render_ms_max': 1000 * self.render_time_max,
+        }
+
+    def _publish_stats(self):
+        self.stats_updated.emit(self.stats())
+        self.reset_stats()
@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity multi-channel sample store.
+
+    All channels live in one preallocated (channels, 2 * capacity) array.
+    Every sample is written twice, at pos and pos + capacity, so the most
+    recent N samples of a channel are always a single contiguous slice and
+    latest() can hand out views instead of copies. generation changes
+    whenever samples already written are discarded or modified in place, so
+    caches keyed on total_written know to start over.
+    """
+
+    def __init__(self, channels, capacity, dtype=np.float32):
+        self.channels = channels
+        self.capacity = int(capacity)
+        self.storage = np.zeros((channels, 2 * self.capacity), dtype=dtype)
+        self.pos = 0
+        self.valid = np.zeros(channels, dtype=np.int64)
+        self.total_written = 0
+        self.generation = 0
+
+    def __len__(self):
+        return int(self.valid.max())
+
+    def count(self, channel):
+        return int(self.valid[channel])
+
+    def clear(self):
+        self.pos = 0
+        self.valid[:] = 0
+        self.total_written = 0
+        self.generation += 1
+
+    def write(self, block):
+        """Appends a (k, n) block of samples to the first k channels.
+
+        Channels missing from the block are zero-filled and marked empty so
+        the channels stay time-aligned.
+        """
+        block = np.asarray(block)
+        if block.ndim == 1:
+            block = block[None, :]
+        rows, n = block.shape
+        if n == 0:
+            return
+        if n > self.capacity:
+            # Only the newest capacity samples survive; keep pos == total_written mod capacity
+            skipped = n - self.capacity
+            block = block[:, skipped:]
+            self.pos = (self.pos + skipped) % self.capacity
+            self.total_written += skipped
+            n = self.capacity
+
+        cap = self.capacity
+        first = min(n, cap - self.pos)
+        second = n - first
+        for base in (self.pos, self.pos + cap):
+            self.storage[:rows, base:base + first] = block[:, :first]
+            self.storage[rows:, base:base + first] = 0
+        if second:
+            for base in (0, cap):
+                self.storage[:rows, base:base + second] = block[:, first:]
+                self.storage[rows:, base:base + second] = 0
+
+        self.pos = (self.pos + n) % cap
+        self.valid[:rows] = np.minimum(self.valid[:rows] + n, cap)
+        self.valid[rows:] = 0
+        self.total_written += n
+
+    def latest(self, n, channel=None):
+        """Zero-copy view of the newest n samples (fewer if not yet filled)."""
+        valid = self.valid[channel] if channel is not None else self.valid.max()
+        n = min(int(n), int(valid))
+        end = self.pos + self.capacity
+        if channel is None:
+            return self.storage[:, end - n:end]
+        return self.storage[channel, end - n:end]
+
+    def scale(self, channel, factor):
+        self.storage[channel] *= factor
+        self.generation += 1
@@ -0,0 +1,95 @@
+import numpy as np
+
+from measure import measure_waveform
+
+
+class SegmentTable:
+    """Preallocated store of fixed-length triggered segments.
+
+    Each segment holds length samples of every channel around one trigger
+    event, with its wall-clock timestamp (as from time.time()), the
+    absolute sample time of the trigger and the trigger's offset within
+    the segment (fractional, so overlays can be aligned to a fraction of a
+    sample). Once capacity segments have been stored the oldest ones are
+    overwritten. Segment i is the i-th oldest still held.
+    """
+
+    def __init__(self, capacity=4096, length=1024, channels=4, dtype=np.float32):
+        self.capacity = int(capacity)
+        self.length = int(length)
+        self.channels = channels
+        self.data = np.zeros((self.capacity, channels, self.length), dtype=dtype)
+        self.timestamps = np.zeros(self.capacity)
+        self.trigger_times = np.zeros(self.capacity)
+        self.trigger_offsets = np.zeros(self.capacity)
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def clear(self):
+        self.total = 0
+
+    def _slot(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError("segment index out of range")
+        return (self.total - len(self) + index % len(self)) % self.capacity
+
+    def _order(self, indices=None):
+        # Slots of the requested segments, oldest first
+        first = self.total - len(self)
+        if indices is None:
+            indices = np.arange(len(self))
+        return (first + np.asarray(indices) % max(len(self), 1)) % self.capacity
+
+    def add(self, samples, trigger_offset, trigger_time, timestamp):
+        """Copies a (k, length) block into the next slot; returns its index."""
+        slot = self.total % self.capacity
+        rows = min(len(samples), self.channels)
+        self.data[slot, :rows] = samples[:rows]
+        self.data[slot, rows:] = 0
+        self.trigger_offsets[slot] = trigger_offset
+        self.trigger_times[slot] = trigger_time
+        self.timestamps[slot] = timestamp
+        self.total += 1
+        return len(self) - 1
+
+    def segment(self, index):
+        """(channels, length) view of one segment."""
+        return self.data[self._slot(index)]
+
+    def info(self, index):
+        slot = self._slot(index)
+        return self.timestamps[slot], self.trigger_times[slot], self.trigger_offsets[slot]
+
+    def channel(self, channel, indices=None):
+        """(n, length) samples of one channel across segments, oldest first."""
+        return self.data[self._order(indices), channel]
+
+    def offsets(self, indices=None):
+        return self.trigger_offsets[self._order(indices)]
+
+    def statistics(self, channel):
+        """Amplitude statistics of every segment of a channel in one pass."""
+        x = self.channel(channel).astype(np.float64)
+        if len(x) == 0:
+            x = np.zeros((0, 1))
+        vmin = x.min(axis=1)
+        vmax = x.max(axis=1)
+        return {
+            'vmin': vmin,
+            'vmax': vmax,
+            'vpp': vmax - vmin,
+            'mean': x.mean(axis=1),
+            'rms': np.sqrt(np.einsum('ij,ij->i', x, x) / self.length),
+            'timestamp': self.timestamps[self._order()],
+        }
+
+    def measure(self, index, channel, sample_rate):
+        return measure_waveform(self.segment(index)[channel], sample_rate)
+
+    def save(self, filename):
+        """Writes the segments held, oldest first, to a compressed .npz file."""
+        order = self._order()
+        np.savez_compressed(filename, data=self.data[order], timestamps=self.timestamps[order],
+                            trigger_times=self.trigger_times[order], trigger_offsets=self.trigger_offsets[order])
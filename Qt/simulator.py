@@ -0,0 +1,225 @@
+import threading
+import time
+
+import numpy as np
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from bufferpool import BlockPool, InFlightLimit
+from crc import stm32_crc32_batch
+from frame import (FrameDecoder, FRAME_DTYPE, FRAME_CAPACITY, FRAME_HEADER, FRAME_FOOTER, FRAME_NO_TRIGGER,
+                   ADC_VOLTS_PER_COUNT)
+
+SHAPES = ['sine', 'square', 'sawtooth', 'pwm', 'noise', 'dc']
+
+
+class SignalSpec:
+    """Description of one simulated channel.
+
+    shape is one of SHAPES; square and sawtooth swing between offset -
+    amplitude and offset + amplitude, pwm between offset and offset +
+    amplitude with the given duty cycle. noise adds Gaussian noise of that
+    standard deviation to any shape. Glitches of glitch_amplitude and
+    glitch_width samples arrive at random at glitch_rate per second. With
+    burst_period set, the signal is only present for the first
+    burst_length seconds of every period and sits at offset otherwise.
+    """
+
+    def __init__(self, shape='sine', frequency=1000.0, amplitude=1.0, offset=0.0, duty=0.5, phase=0.0,
+                 noise=0.0, glitch_rate=0.0, glitch_amplitude=1.0, glitch_width=1,
+                 burst_period=0.0, burst_length=0.0):
+        self.shape = shape
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.offset = offset
+        self.duty = duty
+        self.phase = phase
+        self.noise = noise
+        self.glitch_rate = glitch_rate
+        self.glitch_amplitude = glitch_amplitude
+        self.glitch_width = glitch_width
+        self.burst_period = burst_period
+        self.burst_length = burst_length
+
+
+class SignalGenerator:
+    """Vectorized, seeded waveform generator.
+
+    generate() returns the next n samples of every channel as one
+    (channels, n) float32 block. Phase is derived from the absolute sample
+    index, and every channel draws its noise and its glitch arrivals from
+    random streams of its own, so for a given seed the output does not
+    depend on how it is split into blocks; glitches that straddle a block
+    boundary continue in the next block.
+    """
+
+    def __init__(self, specs=None, sample_rate=100000.0, seed=None):
+        self.specs = specs if specs is not None else [SignalSpec()]
+        self.sample_rate = float(sample_rate)
+        self.seed = seed
+        self.reset()
+
+    @property
+    def channels(self):
+        return len(self.specs)
+
+    def reset(self):
+        self.position = 0
+        self.rng = np.random.default_rng(self.seed)
+        streams = [np.random.default_rng(s) for s in np.random.SeedSequence(self.seed).spawn(3 * self.channels)]
+        # Per channel: shape noise, additive noise and glitch arrivals
+        self.streams = [streams[3 * k:3 * k + 3] for k in range(self.channels)]
+        # Per channel: glitch start times drawn so far that have not ended, and the last one drawn
+        self.glitches = [(np.empty(0), 0.0) for _ in range(self.channels)]
+
+    def generate(self, n):
+        index = np.arange(self.position, self.position + n)
+        t = index / self.sample_rate
+        block = np.empty((self.channels, n), dtype=np.float32)
+        for k, (row, spec) in enumerate(zip(block, self.specs)):
+            row[:] = self._waveform(k, spec, index, t)
+        self.position += n
+        return block
+
+    def _glitch_hits(self, k, spec, start, end):
+        """Samples in [start, end) hit by channel k's glitches, relative to start."""
+        times, last = self.glitches[k]
+        while last < end:
+            # Arrivals come in batches from the channel's own stream, so they do not depend on the block size
+            gaps = self.streams[k][2].exponential(self.sample_rate / spec.glitch_rate, 256)
+            arrivals = last + np.cumsum(gaps)
+            times = np.concatenate((times, arrivals))
+            last = float(arrivals[-1])
+        first = np.floor(times).astype(np.int64)
+        hits = (first[first < end, None] + np.arange(spec.glitch_width)).ravel() - start
+        self.glitches[k] = (times[first + spec.glitch_width > end], last)
+        return hits[(hits >= 0) & (hits < end - start)]
+
+    def _waveform(self, k, spec, index, t):
+        n = len(index)
+        cycles = spec.frequency * t + spec.phase / (2 * np.pi)
+        frac = cycles - np.floor(cycles)
+        if spec.shape == 'sine':
+            x = spec.amplitude * np.sin(2 * np.pi * cycles)
+        elif spec.shape == 'square':
+            x = np.where(frac < spec.duty, spec.amplitude, -spec.amplitude)
+        elif spec.shape == 'sawtooth':
+            x = spec.amplitude * (2 * frac - 1)
+        elif spec.shape == 'pwm':
+            x = np.where(frac < spec.duty, spec.amplitude, 0.0)
+        elif spec.shape == 'noise':
+            x = spec.amplitude * self.streams[k][0].standard_normal(n)
+        else:
+            x = np.full(n, float(spec.amplitude))
+        if spec.noise:
+            x = x + spec.noise * self.streams[k][1].standard_normal(n)
+        if spec.glitch_rate:
+            hits = self._glitch_hits(k, spec, self.position, self.position + n)
+            if len(hits):
+                x = np.array(x, dtype=np.float64)
+                x[hits] += spec.glitch_amplitude
+        if spec.burst_period:
+            x = np.where(np.mod(t, spec.burst_period) < spec.burst_length, x, 0.0)
+        return x + spec.offset
+
+    def counts(self, n, channel=0, volts_per_count=ADC_VOLTS_PER_COUNT):
+        """Next n samples of one channel as 12-bit ADC counts."""
+        volts = self.generate(n)[channel]
+        return np.clip(np.rint(volts / volts_per_count), 0, 4095).astype(np.uint16)
+
+    def frames(self, count, channel=0, corrupt_rate=0.0, trigger_index=FRAME_NO_TRIGGER):
+        """The next count Frame_t packets of one channel, byte-for-byte as
+        the firmware sends them. corrupt_rate is the fraction of frames
+        that get one sample bit flipped after the checksum was computed."""
+        samples = self.counts(count * FRAME_CAPACITY, channel).reshape(count, FRAME_CAPACITY)
+        frames = np.zeros(count, dtype=FRAME_DTYPE)
+        frames['header'] = FRAME_HEADER
+        frames['length'] = FRAME_CAPACITY
+        frames['trigger_index'] = trigger_index
+        frames['data_array'] = samples
+        frames['checksum'] = stm32_crc32_batch(samples, np.full(count, FRAME_CAPACITY))
+        frames['footer'] = FRAME_FOOTER
+        if corrupt_rate:
+            bad = np.flatnonzero(self.rng.random(count) < corrupt_rate)
+            frames['data_array'][bad, self.rng.integers(0, FRAME_CAPACITY, len(bad))] ^= 1
+        return frames.tobytes()
+
+
+class SimulatorReader(QThread):
+    """Acquisition source backed by a SignalGenerator.
+
+    Emits the same (block, sequence, timestamp) signal as SerialReader. In
+    'frames' mode every block goes through Frame_t encoding and the real
+    FrameDecoder, so the host decoding path is exercised too; 'blocks' mode
+    hands the generated volts over directly. speed scales real time (0
+    runs as fast as the consumer allows: at most max_in_flight blocks are
+    waiting to be released at any time).
+    """
+    data_received = pyqtSignal(object, int, float)
+
+    def __init__(self, generator=None, output='blocks', block_size=FRAME_CAPACITY, speed=1.0, corrupt_rate=0.0,
+                 max_in_flight=32):
+        super().__init__()
+        self.generator = generator or SignalGenerator()
+        self.output = output
+        self.block_size = FRAME_CAPACITY if output == 'frames' else block_size
+        self.speed = speed
+        self.corrupt_rate = corrupt_rate
+        self.decoder = FrameDecoder()
+        self.block_pool = BlockPool((self.generator.channels if output == 'blocks' else 1, self.block_size))
+        self.sequence = 0
+        self.samples_emitted = 0
+        self.running = False
+        self.wake = threading.Event()
+        self.in_flight = InFlightLimit(max_in_flight)
+
+    @property
+    def sample_rate(self):
+        return self.generator.sample_rate
+
+    def start(self, *args):
+        # Set before the thread exists, so a stop() right after start() is not lost
+        self.running = True
+        super().start(*args)
+
+    def run(self):
+        start_time = time.monotonic()
+        start_position = self.samples_emitted
+        while self.running:
+            if not self.in_flight.wait(0.1):
+                continue
+            if self.output == 'frames':
+                for frame in self.decoder.feed(self.generator.frames(1, corrupt_rate=self.corrupt_rate)):
+                    block = self.block_pool.acquire()[:, :frame.length]
+                    np.multiply(frame.samples, np.float32(ADC_VOLTS_PER_COUNT), out=block[0])
+                    self.emit_block(block)
+            else:
+                block = self.block_pool.acquire()
+                block[:] = self.generator.generate(self.block_size)
+                self.emit_block(block)
+
+            if self.speed > 0:
+                # Sleep until the wall clock catches up with the generated samples
+                due = start_time + (self.samples_emitted - start_position) / (self.sample_rate * self.speed)
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self.wake.wait(delay)
+                elif delay < -1.0:
+                    # Consumer fell behind; resynchronize instead of bursting
+                    start_time = time.monotonic()
+                    start_position = self.samples_emitted
+
+    def emit_block(self, block):
+        self.in_flight.sent()
+        self.data_received.emit(block, self.sequence, time.monotonic())
+        self.sequence += 1
+        self.samples_emitted += block.shape[1]
+
+    def release(self, block):
+        self.block_pool.release(block)
+        self.in_flight.release()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        self.quit()
+        self.wait()
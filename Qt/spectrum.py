@@ -0,0 +1,281 @@
+import threading
+
+import numpy as np
+from PyQt6.QtCore import QThread, pyqtSignal
+
+FFT_SIZES = [1 << k for k in range(8, 17)]
+
+WINDOWS = ['Hann', 'Blackman-Harris', 'Flat Top', 'Rectangular']
+
+AVERAGING_MODES = ['None', 'Linear', 'Exponential', 'Peak Hold']
+
+# Cosine-sum coefficients a0, a1, a2, ... of w[n] = sum (-1)^k a_k cos(2 pi k n / N)
+_COSINE_SUMS = {
+    'Hann': (0.5, 0.5),
+    'Blackman-Harris': (0.35875, 0.48829, 0.14128, 0.01168),
+    'Flat Top': (0.21557895, 0.41663158, 0.277263158, 0.083578947, 0.006947368),
+    'Rectangular': (1.0,),
+}
+
+_window_cache = {}
+_frequency_cache = {}
+
+
+def spectrum_window(name, size):
+    """Periodic window of the given size, scaled so that a full-scale sine
+    reads its peak amplitude. Cached per (name, size)."""
+    key = (name, size)
+    window = _window_cache.get(key)
+    if window is None:
+        phase = 2 * np.pi * np.arange(size) / size
+        window = np.zeros(size)
+        for k, a in enumerate(_COSINE_SUMS[name]):
+            window += (-1) ** k * a * np.cos(k * phase)
+        window *= 2 / window.sum()
+        _window_cache[key] = window
+    return window
+
+
+def spectrum_frequencies(size, sample_rate):
+    key = (size, sample_rate)
+    freqs = _frequency_cache.get(key)
+    if freqs is None:
+        freqs = np.fft.rfftfreq(size, 1 / sample_rate)
+        _frequency_cache[key] = freqs
+    return freqs
+
+
+def power_spectrum(samples, window):
+    """Peak-amplitude-squared spectrum (V^2) of the last len(window) samples.
+
+    The window mean is removed first so the ADC's DC offset does not leak
+    into the low bins; shorter inputs are zero-padded at the front.
+    """
+    size = len(window)
+    x = np.zeros(size)
+    n = min(len(samples), size)
+    if n:
+        tail = samples[len(samples) - n:]
+        x[size - n:] = tail - tail.mean()
+    spectrum = np.fft.rfft(x * window)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    # The window gain doubles every bin; DC and Nyquist have no mirror image
+    power[0] /= 4
+    if size % 2 == 0:
+        power[-1] /= 4
+    return power
+
+
+class SpectrumEngine:
+    """Windowed real-FFT spectrum with averaging across successive windows.
+
+    Averaging is done on power: 'Linear' is the mean of the last `count`
+    spectra, 'Exponential' weighs each new spectrum by 1 / count, and
+    'Peak Hold' keeps the per-bin maximum. Any change of size, window or
+    mode restarts the average.
+    """
+
+    def __init__(self, size=4096, window='Hann', averaging='None', count=8):
+        self.size = size
+        self.window_name = window
+        self.averaging = averaging
+        self.count = count
+        self.reset()
+
+    def configure(self, size=None, window=None, averaging=None, count=None):
+        if size is not None:
+            self.size = size
+        if window is not None:
+            self.window_name = window
+        if averaging is not None:
+            self.averaging = averaging
+        if count is not None:
+            self.count = max(1, int(count))
+        self.reset()
+
+    def reset(self):
+        self.average = None
+        self.history = []
+        self.spectra = 0
+
+    def process(self, samples, sample_rate):
+        """Returns (frequencies, magnitudes in dBV) for one new window."""
+        return self.accumulate(power_spectrum(samples, spectrum_window(self.window_name, self.size)), sample_rate)
+
+    def accumulate(self, power, sample_rate):
+        """Averages in a power spectrum computed elsewhere; one of another
+        size than the running average restarts it."""
+        if self.average is not None and len(power) != len(self.average):
+            self.reset()
+        if self.average is None or self.averaging == 'None':
+            self.average = power.copy()
+            self.history = [power]
+        elif self.averaging == 'Linear':
+            self.history.append(power)
+            if len(self.history) > self.count:
+                # Running sum: drop the oldest spectrum instead of re-summing them all
+                self.average += (power - self.history.pop(0)) / self.count
+            else:
+                self.average += (power - self.average) / len(self.history)
+        elif self.averaging == 'Exponential':
+            self.average += (power - self.average) / self.count
+        elif self.averaging == 'Peak Hold':
+            np.maximum(self.average, power, out=self.average)
+        self.spectra += 1
+        db = 10 * np.log10(np.maximum(self.average, 1e-20))
+        return spectrum_frequencies(2 * (len(power) - 1), sample_rate), db.astype(np.float32)
+
+
+class SpectrumWorker(QThread):
+    """Runs a SpectrumEngine off the GUI thread.
+
+    submit() copies the newest window and returns immediately; if the worker
+    is still busy the pending window is replaced, so the spectrum keeps up
+    with the display rate and never builds a backlog.
+    """
+    spectrum_ready = pyqtSignal(object, object)
+
+    def __init__(self, engine=None):
+        super().__init__()
+        self.engine = engine or SpectrumEngine()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = None
+        self.settings = None
+        self.reset_pending = False
+        self.running = False
+        self.dropped = 0
+
+    def configure(self, **settings):
+        with self.lock:
+            self.settings = dict(self.settings or {}, **settings)
+        self.wake.set()
+
+    def reset(self):
+        """Restarts averaging before the next window is processed."""
+        with self.lock:
+            self.reset_pending = True
+        self.wake.set()
+
+    def submit(self, samples, sample_rate):
+        window = np.array(samples[len(samples) - min(len(samples), self.engine.size):], dtype=np.float64)
+        self._queue((window, sample_rate, False))
+
+    def submit_power(self, power, sample_rate):
+        """Queues a power spectrum that was already computed (by an
+        AnalysisExecutor) for averaging only."""
+        self._queue((power, sample_rate, True))
+
+    def _queue(self, job):
+        with self.lock:
+            if self.pending is not None:
+                self.dropped += 1
+            self.pending = job
+        self.wake.set()
+
+    def start(self, *args):
+        # Set before the thread exists, so a stop() right after start() is not lost
+        self.running = True
+        super().start(*args)
+
+    def run(self):
+        while self.running:
+            self.wake.wait(0.1)
+            self.wake.clear()
+            with self.lock:
+                job, self.pending = self.pending, None
+                settings, self.settings = self.settings, None
+                reset, self.reset_pending = self.reset_pending, False
+            if settings:
+                self.engine.configure(**settings)
+            elif reset:
+                self.engine.reset()
+            if job is None:
+                continue
+            data, sample_rate, is_power = job
+            if is_power:
+                freqs, db = self.engine.accumulate(data, sample_rate)
+            else:
+                freqs, db = self.engine.process(data, sample_rate)
+            self.spectrum_ready.emit(freqs, db)
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        self.wait()
+
+
+class Spectrogram:
+    """Scrolling short-time spectrum of one RingBuffer channel.
+
+    Columns are size-sample windows hop samples apart, hop being set by
+    overlap. update() transforms only the windows completed since the last
+    call, in one batched rfft, and writes their dBV rows into a
+    preallocated (2 * history, bins) image that is mirrored like the ring
+    itself, so image() is always one contiguous view of the newest history
+    columns, oldest first.
+    """
+
+    def __init__(self, ring, channel=0, size=1024, overlap=0.5, window='Hann', history=256):
+        self.ring = ring
+        self.history = history
+        self.configure(channel, size, overlap, window)
+
+    def configure(self, channel=None, size=None, overlap=None, window=None):
+        if channel is not None:
+            self.channel = channel
+        if size is not None:
+            self.size = size
+        if overlap is not None:
+            self.overlap = overlap
+        if window is not None:
+            self.window_name = window
+        self.hop = max(1, self.size - int(self.size * self.overlap))
+        self.bins = self.size // 2 + 1
+        self.rows = np.full((2 * self.history, self.bins), -200.0, dtype=np.float32)
+        self.row = 0
+        self.columns = 0
+        self.next_start = None
+
+    def update(self):
+        """Computes the newly completed columns and returns how many there were."""
+        total = self.ring.total_written
+        if self.next_start is None or total < self.next_start:
+            # First call, or the ring was cleared: start at the newest full window
+            self.next_start = max(total - self.size, 0)
+        available = self.ring.count(self.channel)
+        oldest = total - available
+        if self.next_start < oldest:
+            # Samples were overwritten before they were transformed
+            self.next_start += -(-(oldest - self.next_start) // self.hop) * self.hop
+        count = (total - self.next_start - self.size) // self.hop + 1
+        if count <= 0:
+            return 0
+        if count > self.history:
+            # Older columns would scroll straight out of the image anyway
+            self.next_start += (count - self.history) * self.hop
+            count = self.history
+        span = (count - 1) * self.hop + self.size
+        samples = self.ring.latest(total - self.next_start, self.channel)[:span]
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.size)[::self.hop]
+        frames = frames - frames.mean(axis=1, keepdims=True)
+        spectrum = np.fft.rfft(frames * spectrum_window(self.window_name, self.size), axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        power[:, 0] /= 4
+        power[:, -1] /= 4
+        db = 10 * np.log10(np.maximum(power, 1e-20))
+
+        first = self.row
+        head = min(count, self.history - first)
+        for base in (first, first + self.history):
+            self.rows[base:base + head] = db[:head]
+        if head < count:
+            for base in (0, self.history):
+                self.rows[base:base + count - head] = db[head:]
+        self.row = (first + count) % self.history
+        self.columns += count
+        self.next_start += count * self.hop
+        return count
+
+    def image(self):
+        return self.rows[self.row:self.row + self.history]
@@ -0,0 +1,30 @@
+import numpy as np
+
+from decimate import MinMaxPyramid
+from ringbuffer import RingBuffer
+from simulator import SignalGenerator, SignalSpec
+
+
+def test_pyramid_matches_brute_force():
+    ring = RingBuffer(2, 1 << 12)
+    pyramid = MinMaxPyramid(ring)
+    specs = [SignalSpec('noise'), SignalSpec('sine', frequency=30, glitch_rate=200, glitch_amplitude=5)]
+    generator = SignalGenerator(specs, sample_rate=10000, seed=7)
+    history = np.empty((2, 0), dtype=np.float32)
+    rng = np.random.default_rng(8)
+    for _ in range(40):
+        block = generator.generate(int(rng.integers(1, 1500)))
+        ring.write(block)
+        history = np.concatenate((history, block), axis=1)
+        pyramid.update()
+        total = ring.total_written
+        for _ in range(5):
+            end = int(rng.integers(max(total - ring.capacity, 0) + 1, total + 1))
+            start = int(rng.integers(max(total - ring.capacity, 0), end))
+            channel = int(rng.integers(0, 2))
+            positions, values = pyramid.query(channel, start, end, int(rng.integers(1, 50)))
+            window = history[channel, start:end]
+            # The envelope covers exactly the samples in the window
+            assert values.min() == window.min()
+            assert values.max() == window.max()
+            assert positions.min() >= 0 and positions.max() < end - start
@@ -0,0 +1,59 @@
+import io
+
+import numpy as np
+
+from frame import FrameDecoder, FRAME_CAPACITY, FRAME_SIZE
+from simulator import SignalGenerator, SignalSpec
+
+
+def stream(count, seed=0, corrupt_rate=0.0):
+    generator = SignalGenerator([SignalSpec(offset=1.65, noise=0.05)], seed=seed)
+    return generator.frames(count, corrupt_rate=corrupt_rate)
+
+
+def decode(decoder, raw, chunks):
+    samples = []
+    for chunk in chunks:
+        for frame in decoder.feed(raw[chunk]):
+            samples.append(frame.samples.copy())
+    return samples
+
+
+def test_split_stream_decodes_every_frame():
+    raw = stream(20)
+    expected = np.frombuffer(raw, dtype='<u2').reshape(20, -1)
+    rng = np.random.default_rng(2)
+    cuts = np.sort(rng.integers(0, len(raw), 30))
+    bounds = np.concatenate(([0], cuts, [len(raw)]))
+    decoder = FrameDecoder()
+    frames = decode(decoder, raw, [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:])])
+    assert len(frames) == 20
+    for frame, row in zip(frames, expected):
+        assert np.array_equal(frame, row[3:3 + FRAME_CAPACITY])
+
+
+def test_resyncs_after_garbage_and_truncated_frame():
+    raw = stream(3)
+    data = b'\x55\xaa\x00garbage' + raw[:FRAME_SIZE // 2] + raw
+    decoder = FrameDecoder()
+    frames = decode(decoder, data, [slice(0, len(data))])
+    assert len(frames) == 3
+    assert decoder.resyncs > 0
+
+
+def test_corrupt_frames_are_counted_and_skipped():
+    raw = stream(200, seed=3, corrupt_rate=0.2)
+    decoder = FrameDecoder()
+    frames = decode(decoder, raw, [slice(0, len(raw))])
+    assert decoder.frames_corrupt > 0
+    assert len(frames) + decoder.frames_corrupt == 200
+
+
+def test_read_from_port():
+    raw = stream(10)
+    port = io.BytesIO(raw)
+    decoder = FrameDecoder()
+    frames = []
+    while port.tell() < len(raw):
+        frames.extend(frame.samples.copy() for frame in decoder.read(port, 700))
+    assert len(frames) == 10
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from measure import measure_frequency, frequency_fft, frequency_autocorrelation
+
+
+@pytest.mark.parametrize('estimate', [measure_frequency, frequency_fft, frequency_autocorrelation])
+def test_dc_has_no_frequency(estimate):
+    samples = np.full(100000, 1.65, dtype=np.float32)
+    assert estimate(samples, 100000).confidence == 0.0
+
+
+@pytest.mark.parametrize('estimate', [measure_frequency, frequency_fft])
+def test_less_than_one_cycle_has_no_frequency(estimate):
+    t = np.arange(100000) / 100000
+    samples = np.sin(2 * np.pi * 0.3 * t).astype(np.float32)
+    result = estimate(samples, 100000)
+    assert result.confidence == 0.0
+
+
+def test_sine_frequency():
+    t = np.arange(10000) / 100000
+    samples = (1.65 + np.sin(2 * np.pi * 1234.0 * t)).astype(np.float32)
+    for method in ('auto', 'zero_crossing', 'autocorrelation', 'fft'):
+        result = measure_frequency(samples, 100000, method)
+        assert result.frequency == pytest.approx(1234.0, rel=2e-3)
+        assert result.confidence > 0.5
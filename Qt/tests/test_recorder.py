@@ -0,0 +1,36 @@
+import numpy as np
+
+from frame import ADC_VOLTS_PER_COUNT
+from playback import CaptureFile
+from recorder import WaveformRecorder
+from simulator import SignalGenerator, SignalSpec
+
+
+def record(path, blocks, *args, **kwargs):
+    recorder = WaveformRecorder(str(path), *args, **kwargs)
+    recorder.start()
+    for block in blocks:
+        recorder.submit(block)
+    recorder.stop()
+    return CaptureFile(str(path))
+
+
+def test_float_round_trip(tmp_path):
+    generator = SignalGenerator([SignalSpec(noise=0.1), SignalSpec('square')], seed=6)
+    blocks = [generator.generate(n) for n in (100, 1, 4000)]
+    capture = record(tmp_path / 'a.sdo', blocks, 50000)
+    assert capture.sample_rate == 50000
+    assert capture.channels == 2
+    assert np.array_equal(capture.window(0, len(capture)), np.concatenate(blocks, axis=1))
+    capture.close()
+
+
+def test_adc_codes_round_trip(tmp_path):
+    counts = np.arange(4096, dtype=np.float32)[None]
+    capture = record(tmp_path / 'b.sdo', [counts * np.float32(ADC_VOLTS_PER_COUNT)], 0,
+                     dtype=np.uint16, scale=ADC_VOLTS_PER_COUNT)
+    assert capture.sample_rate == 0
+    assert capture.dtype == np.uint16
+    assert np.array_equal(np.asarray(capture.samples[:, 0]), counts[0])
+    assert np.allclose(capture.window(0, 4096), counts * ADC_VOLTS_PER_COUNT)
+    capture.close()
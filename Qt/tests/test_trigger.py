@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from simulator import SignalGenerator, SignalSpec
+from trigger import EdgeTrigger, PulseWidthTrigger, RuntTrigger, WindowTrigger, TriggerEngine
+
+
+def signal():
+    specs = [SignalSpec('pwm', frequency=700, amplitude=2.0, duty=0.3, noise=0.05,
+                        glitch_rate=300, glitch_amplitude=1.5, glitch_width=3)]
+    return SignalGenerator(specs, sample_rate=100000, seed=4).generate(20000)[0]
+
+
+TRIGGERS = [
+    lambda: EdgeTrigger(1.0, 'Rising', 0.1),
+    lambda: EdgeTrigger(1.0, 'Falling', 0.1),
+    lambda: PulseWidthTrigger(1.0, 0.1, 'Either', '<', max_width=10),
+    lambda: RuntTrigger(0.5, 1.8, 0.05),
+    lambda: WindowTrigger(0.5, 1.5, 0.05, 'Exit'),
+]
+
+
+@pytest.mark.parametrize('make', TRIGGERS)
+def test_events_do_not_depend_on_block_split(make):
+    x = signal()
+    whole = make().find(x, 0)
+    assert len(whole)
+    rng = np.random.default_rng(5)
+    trigger = make()
+    parts = []
+    start = 0
+    while start < len(x):
+        n = int(rng.integers(1, 700))
+        parts.append(trigger.find(x[start:start + n], start))
+        start += n
+    assert np.allclose(np.concatenate(parts), whole)
+
+
+def test_hardware_index_replaces_the_search():
+    x = np.tile(np.r_[np.zeros(10), np.ones(10)], 5)
+    engine = TriggerEngine(EdgeTrigger(0.5), holdoff=30)
+    assert engine.process(x, 100, hardware_index=12).tolist() == [112.0]
+    # Holdoff applies to hardware events too
+    assert engine.process(x, 120, hardware_index=5).tolist() == []
+    assert engine.process(x, 200, search=False).tolist() == []
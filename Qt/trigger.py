@@ -0,0 +1,315 @@
+from collections import deque
+
+import numpy as np
+
+
+def comparator(samples, low, high, state=-1):
+    """Schmitt comparator over one block, continuing from the state left by
+    the previous block: 1 above high, 0 below low, and the previous state
+    in between (-1 until the first decision)."""
+    decided = (samples > high) | (samples < low)
+    index = np.where(decided, np.arange(len(samples)), -1)
+    np.maximum.accumulate(index, out=index)
+    states = np.full(len(samples), state, dtype=np.int8)
+    known = index >= 0
+    states[known] = samples[index[known]] > high
+    return states
+
+
+class EdgeTrigger:
+    """Rising or falling crossings of level with hysteresis.
+
+    An edge is confirmed once the signal has been below level - hysteresis
+    and then goes above level + hysteresis (mirrored for falling edges).
+    Its time is the last crossing of level itself before confirmation,
+    interpolated between samples. The comparator state, the last sample and
+    the last level crossing are carried over, so edges that straddle a
+    block boundary are found exactly once.
+    """
+
+    def __init__(self, level=0.0, slope='Rising', hysteresis=0.0):
+        self.level = level
+        self.slope = slope
+        self.hysteresis = hysteresis
+        self.reset()
+
+    def reset(self):
+        self.state = -1
+        self.last_sample = None
+        self.last_crossing = None
+
+    def find(self, samples, start):
+        """Absolute sub-sample times of the edges in samples, whose first
+        sample has absolute index start."""
+        if len(samples) == 0:
+            return np.empty(0)
+        sign = -1.0 if self.slope == 'Falling' else 1.0
+        x = sign * np.asarray(samples, dtype=np.float64)
+        level = sign * self.level
+        states = comparator(x, level - self.hysteresis, level + self.hysteresis, self.state)
+        previous = np.empty_like(states)
+        previous[0] = self.state
+        previous[1:] = states[:-1]
+        edges = np.flatnonzero((states == 1) & (previous == 0))
+
+        # Level crossings, including one between the previous block and this one
+        if self.last_sample is None:
+            x_ext, offset = x, start
+        else:
+            x_ext, offset = np.concatenate(([sign * self.last_sample], x)), start - 1
+        above = x_ext > level
+        raw = np.flatnonzero(above[1:] & ~above[:-1]) + 1
+        before = x_ext[raw - 1]
+        crossings = offset + raw - 1 + (level - before) / (x_ext[raw] - before)
+
+        times = np.empty(0)
+        if len(edges):
+            # Last crossing at or before each edge; older ones come from earlier blocks
+            if self.last_crossing is not None:
+                crossings_ext = np.concatenate(([self.last_crossing], crossings))
+                raw_ext = np.concatenate(([-1], raw + offset))
+            else:
+                crossings_ext, raw_ext = crossings, raw + offset
+            which = np.searchsorted(raw_ext, start + edges, side='right') - 1
+            times = np.where(which >= 0, crossings_ext[np.maximum(which, 0)], start + edges).astype(np.float64)
+
+        self.state = int(states[-1])
+        self.last_sample = float(samples[-1])
+        if len(crossings):
+            self.last_crossing = float(crossings[-1])
+        return times
+
+
+def _merge(*streams):
+    """Sorts several arrays of event times into one, returning the times and
+    the index of the stream each one came from."""
+    times = np.concatenate(streams)
+    kinds = np.concatenate([np.full(len(t), k, dtype=np.int8) for k, t in enumerate(streams)])
+    order = np.argsort(times, kind='stable')
+    return times[order], kinds[order]
+
+
+class PulseWidthTrigger:
+    """Fires at the trailing edge of a pulse whose width qualifies.
+
+    polarity is 'Positive' (rising then falling edge), 'Negative' or
+    'Either'. condition '<' fires on pulses shorter than max_width, '>' on
+    pulses longer than min_width and 'Range' on pulses in between; widths
+    are in samples. A glitch trigger is polarity 'Either' with '<'. The
+    last edge is carried over, so a pulse spanning blocks is measured
+    exactly.
+    """
+
+    def __init__(self, level=0.0, hysteresis=0.0, polarity='Positive', condition='<', min_width=0.0, max_width=0.0):
+        self.rising = EdgeTrigger(level, 'Rising', hysteresis)
+        self.falling = EdgeTrigger(level, 'Falling', hysteresis)
+        self.polarity = polarity
+        self.condition = condition
+        self.min_width = min_width
+        self.max_width = max_width
+        self.reset()
+
+    def reset(self):
+        self.rising.reset()
+        self.falling.reset()
+        self.last_time = None
+        self.last_kind = None
+
+    def find(self, samples, start):
+        times, kinds = _merge(self.falling.find(samples, start), self.rising.find(samples, start))
+        if len(times) == 0:
+            return times
+        # kinds: 1 for rising, 0 for falling; the comparator makes them alternate
+        previous_times = np.concatenate(([np.nan if self.last_time is None else self.last_time], times[:-1]))
+        previous_kinds = np.concatenate(([-1 if self.last_kind is None else self.last_kind], kinds[:-1]))
+        self.last_time = float(times[-1])
+        self.last_kind = int(kinds[-1])
+
+        ends = (previous_kinds >= 0) & (kinds != previous_kinds)
+        if self.polarity == 'Positive':
+            ends &= kinds == 0
+        elif self.polarity == 'Negative':
+            ends &= kinds == 1
+        widths = times - previous_times
+        if self.condition == '<':
+            ends &= widths < self.max_width
+        elif self.condition == '>':
+            ends &= widths > self.min_width
+        else:
+            ends &= (widths >= self.min_width) & (widths <= self.max_width)
+        return times[ends]
+
+
+class RuntTrigger:
+    """Fires when a pulse crosses the low threshold and falls back across it
+    without ever reaching the high threshold (mirrored for 'Negative').
+
+    The open pulse and whether it has reached the high threshold are
+    carried over between blocks.
+    """
+
+    def __init__(self, low=0.0, high=1.0, hysteresis=0.0, polarity='Positive'):
+        self.polarity = polarity
+        if polarity == 'Negative':
+            # A negative runt is a positive one of the inverted signal
+            low, high = -high, -low
+        self.enter = EdgeTrigger(low, 'Rising', hysteresis)
+        self.leave = EdgeTrigger(low, 'Falling', hysteresis)
+        self.reach = EdgeTrigger(high, 'Rising', hysteresis)
+        self.reset()
+
+    def reset(self):
+        self.enter.reset()
+        self.leave.reset()
+        self.reach.reset()
+        self.open = False
+        self.reached = False
+
+    def find(self, samples, start):
+        if self.polarity == 'Negative':
+            samples = -np.asarray(samples, dtype=np.float64)
+        enters = self.enter.find(samples, start)
+        leaves = self.leave.find(samples, start)
+        reaches = self.reach.find(samples, start)
+        times, kinds = _merge(leaves, enters)
+        if len(times) == 0:
+            self.reached |= self.open and len(reaches) > 0
+            return times
+        # Each leave closes the pulse opened by the enter (or carried pulse) before it
+        opened = np.concatenate(([self.open], kinds[:-1] == 1))
+        starts = np.concatenate(([-np.inf], times[:-1]))
+        closing = (kinds == 0) & opened
+        high_count = np.searchsorted(reaches, times) - np.searchsorted(reaches, starts)
+        carried = np.zeros(len(times), dtype=bool)
+        carried[0] = self.reached
+        runts = closing & (high_count == 0) & ~carried
+        self.open = bool(kinds[-1] == 1)
+        self.reached = self.open and bool(np.searchsorted(reaches, times[-1]) < len(reaches))
+        return times[runts]
+
+
+class WindowTrigger:
+    """Fires when the signal enters ('Enter') or leaves ('Exit') the band
+    between low and high."""
+
+    def __init__(self, low=0.0, high=1.0, hysteresis=0.0, direction='Enter'):
+        self.direction = direction
+        # Entering crosses low upwards or high downwards; leaving is the opposite
+        enter = direction == 'Enter'
+        self.low_edge = EdgeTrigger(low, 'Rising' if enter else 'Falling', hysteresis)
+        self.high_edge = EdgeTrigger(high, 'Falling' if enter else 'Rising', hysteresis)
+
+    def reset(self):
+        self.low_edge.reset()
+        self.high_edge.reset()
+
+    def find(self, samples, start):
+        return np.sort(np.concatenate((self.low_edge.find(samples, start), self.high_edge.find(samples, start))))
+
+
+class TriggerEngine:
+    """Turns trigger events into sweeps to display.
+
+    process() runs the trigger over every incoming block of the source
+    channel and keeps the accepted events, dropping those that fall within
+    holdoff samples of the previous accepted one. sweep() then picks the
+    newest event that has pre samples before it and post samples after it
+    in the buffer:
+
+    - Auto shows it, or free-runs (returns None) when no event has
+      completed within the last sweep length;
+    - Normal shows it, or keeps showing the previous one;
+    - Single shows the first one and then stops accepting events until
+      arm() is called.
+    """
+
+    def __init__(self, trigger=None, mode='Auto', holdoff=0):
+        self.trigger = trigger or EdgeTrigger()
+        self.mode = mode
+        self.holdoff = holdoff
+        self.reset()
+
+    def reset(self):
+        self.trigger.reset()
+        self.events = deque(maxlen=64)
+        self.last_event = None
+        self.displayed = None
+        self.armed = True
+        self.end = 0
+
+    def set_trigger(self, trigger):
+        self.trigger = trigger
+        self.reset()
+
+    def set_mode(self, mode):
+        self.mode = mode
+        self.arm()
+
+    def arm(self):
+        self.armed = True
+        self.displayed = None
+        self.events.clear()
+
+    def process(self, samples, start, hardware_index=None, search=True):
+        """Searches one block; returns the times of the events that passed
+        holdoff. They are returned even when Single mode has disarmed the
+        engine, so segmented capture keeps collecting, but only kept for
+        sweep() while armed.
+
+        hardware_index is the trigger position the acquisition hardware
+        reported within the block, if any; the caller only passes it when
+        the hardware detects what the trigger is configured for. It is
+        used instead of the software search for that block and goes
+        through holdoff like any other event. With search=False only
+        hardware events are taken.
+        """
+        self.end = start + len(samples)
+        if hardware_index is not None:
+            # The software search restarts from scratch after the hardware took over
+            self.trigger.reset()
+            times = np.array([start + hardware_index], dtype=np.float64)
+        elif search:
+            times = self.trigger.find(samples, start)
+        else:
+            times = np.empty(0)
+        if len(times) == 0:
+            return times
+        if self.holdoff <= 0:
+            accepted = times
+        else:
+            accepted = []
+            i = 0 if self.last_event is None else np.searchsorted(times, self.last_event + self.holdoff)
+            while i < len(times):
+                accepted.append(times[i])
+                i = np.searchsorted(times, times[i] + self.holdoff, side='left')
+            accepted = np.array(accepted, dtype=np.float64)
+        if len(accepted):
+            self.last_event = float(accepted[-1])
+            if self.armed:
+                self.events.extend(accepted.tolist())
+        return accepted
+
+    def sweep(self, pre, post, oldest):
+        """Trigger time to align the display to, or None for none."""
+        complete = None
+        for t in reversed(self.events):
+            first = int(np.floor(t))
+            if first + post <= self.end and first - pre >= oldest:
+                complete = t
+                break
+        if complete is not None and self.mode == 'Single' and self.armed:
+            self.armed = False
+            self.displayed = complete
+        if self.mode == 'Single':
+            return self.displayed
+        if complete is not None:
+            self.displayed = complete
+            if self.mode == 'Auto' and self.end - np.floor(complete) > 2 * (pre + post):
+                return None
+            return complete
+        if self.mode == 'Auto':
+            return None
+        if self.displayed is not None and np.floor(self.displayed) - pre < oldest:
+            # The held sweep has been overwritten in the buffer
+            self.displayed = None
+        return self.displayed
@@ -3,6 +3,7 @@
 #include "parameters.h"
 
 extern uint8_t keepSampling;
+extern uint8_t triggered;
 
 Frame_t tx_frame1;
 Frame_t tx_frame2;
@@ -36,13 +37,15 @@ void Transmit_Frame(uint16_t* samples, uint16_t trigger_index){
 	if(keepSampling){
 		current_frame->header = 0xAA55;
 		current_frame->footer = 0x55AA;
-		current_frame->length = NUM_SAMPLES;
-		current_frame->trigger_index = 32;
-		calc_checksum(current_frame);
+		current_frame->length = (NUM_SAMPLES > FRAME_SAMPLES) ? FRAME_SAMPLES : NUM_SAMPLES;
+		// Report where the EXTI trigger fired, if it fell inside this frame
+		current_frame->trigger_index = (triggered && trigger_index < current_frame->length) ? trigger_index : FRAME_NO_TRIGGER;
+		triggered = 0;
 
 		for(uint16_t i = 0; i < current_frame->length; i++){
 			current_frame->data_array[i] = samples[i];
 		}
+		calc_checksum(current_frame);
 		Start_DMA_Transmission(current_frame);
 
 		current_frame = (current_frame == &tx_frame1) ? &tx_frame2: &tx_frame1;
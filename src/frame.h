@@ -10,11 +10,15 @@
 
 #include <stdint.h>
 
+#define FRAME_SAMPLES 256
+// trigger_index value of a frame captured without a trigger event
+#define FRAME_NO_TRIGGER 0xFFFF
+
 typedef struct {
 	uint16_t header;
 	uint16_t length;
 	uint16_t trigger_index;
-	uint16_t data_array[256];
+	uint16_t data_array[FRAME_SAMPLES];
 	uint32_t checksum;
 	uint16_t footer;
 